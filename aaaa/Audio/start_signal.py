@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+
+START_SOUND = "music/start.mp3"
+FREQUENCY = 44100
+BUFFER = 256          # frames per mixer callback, 5.8 ms at 44.1 kHz where SDL defaults to 4096
+SIGNAL_CHANNEL = 0    # reserved, no other sound can take it
+
+
+# The start beep, decoded from MP3 to PCM once when it is loaded.
+# mixer.music streams and decodes the file on every play(), a Sound is
+# already raw samples in the mixer's format, so play() only points a channel
+# at them. The mixer picks the channel up at its next callback, which comes
+# at most one buffer period later, so the buffer is kept small.
+class MixerSignal:
+    name = "pygame"
+
+    def __init__(self, path: str = START_SOUND, buffer: int = BUFFER, frequency: int = FREQUENCY):
+        import pygame
+
+        pygame.mixer.pre_init(frequency, -16, 2, buffer)
+        pygame.mixer.init()
+        self.frequency = pygame.mixer.get_init()[0]
+        self.buffer = buffer
+        t = time.perf_counter_ns()
+        self.sound = pygame.mixer.Sound(path)
+        self.decode_ns = time.perf_counter_ns() - t
+        pygame.mixer.set_reserved(SIGNAL_CHANNEL + 1)
+        self.channel = pygame.mixer.Channel(SIGNAL_CHANNEL)
+        self.calls = deque(maxlen=50)   # ns each play() call took
+
+    @property
+    def buffer_ns(self) -> int:
+        return self.buffer * 1_000_000_000 // self.frequency
+
+    def play(self):
+        t = time.perf_counter_ns()
+        self.channel.play(self.sound)
+        self.calls.append(time.perf_counter_ns() - t)
+
+    def stop(self):
+        self.channel.stop()
+
+    def call_ns(self) -> int:
+        calls = sorted(self.calls)
+        return calls[len(calls) // 2] if calls else 0
+
+    def lead_ns(self) -> int:
+        """Mean delay from play() until the mixer callback copies the first samples."""
+        return self.call_ns() + self.buffer_ns // 2
+
+    def report(self) -> str:
+        return (f"Start sound: {self.name}, decoded in {self.decode_ns / 1e6:.1f} ms, "
+                f"trigger to audio callback <= {(self.call_ns() + self.buffer_ns) / 1e6:.2f} ms "
+                f"(play call {self.call_ns() / 1e6:.3f} ms + buffer {self.buffer_ns / 1e6:.2f} ms)")
+
+
+# Same interface and no sound, for machines without an audio device
+class NullSignal:
+    name = "null"
+
+    def __init__(self, *args, **kwargs):
+        self.plays = 0
+
+    def play(self):
+        self.plays += 1
+
+    def stop(self):
+        pass
+
+    def lead_ns(self) -> int:
+        return 0
+
+    def report(self) -> str:
+        return f"Start sound: null backend, {self.plays} silent starts"
+
+
+def load_signal(backend: str = "pygame", path: str = START_SOUND) -> "MixerSignal | NullSignal":
+    """The start sound on backend "pygame" or "null", falls back to null when audio cannot open."""
+    if backend == "null":
+        return NullSignal()
+    try:
+        return MixerSignal(path)
+    except Exception as e:  # pygame missing, no audio device or no file
+        print("Error: ", e)
+        return NullSignal()
+
+
+# Loads the signal on a background thread, importing pygame alone takes about
+# 300 ms, which should not stand between the start of the app and its first frame.
+# Nothing ever waits for it, ARMED is handled on the Tk thread and a hung mixer
+# init must not freeze the board: until it is loaded the start is silent with no lead.
+class LazySignal:
+    def __init__(self, backend: str = "pygame", path: str = START_SOUND):
+        self.backend = backend
+        self.path = path
+        self.load_ns = 0
+        self._signal = None
+        self._silent = NullSignal()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._loading = False
+
+    def warm(self):
+        """Start loading if nothing did yet, returns at once."""
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._load, daemon=True, name="audio-load").start()
+
+    def _load(self):
+        t = time.perf_counter_ns()
+        self._signal = load_signal(self.backend, self.path)
+        self.load_ns = time.perf_counter_ns() - t
+        self._ready.set()
+        print(f"{self._signal.report()}, ready {self.load_ns / 1e6:.0f} ms after loading began")
+
+    @property
+    def signal(self) -> "MixerSignal | NullSignal":
+        """The loaded signal, or a silent one while it is still loading."""
+        self.warm()
+        return self._signal if self._ready.is_set() else self._silent
+
+    @property
+    def name(self) -> str:
+        return self._signal.name if self._ready.is_set() else "loading"
+
+    def play(self):
+        if not self._ready.is_set():
+            print("Error: ", "start sound not loaded yet, silent start")
+        self.signal.play()
+
+    def stop(self):
+        if self._ready.is_set():
+            self._signal.stop()
+
+    def lead_ns(self) -> int:
+        return self.signal.lead_ns()
+
+    def report(self) -> str:
+        return self._signal.report() if self._ready.is_set() else "Start sound: not loaded yet"
@@ -1,7 +1,10 @@
 import threading
 import socket
 import json
-from Screen import app as tk
+import time
+from Connection.framing import FrameDecoder
+from Connection.clocksync import ClockSync
+from Monitor.metrics import metrics
 
 HOST = '0.0.0.0'
 PORT = 5000
@@ -12,85 +15,56 @@ pico_addr = {
     ("10.42.0.39", 6000),
     ("10.42.0.225", 6000)
 }
-send = threading.Event()
+# Per-lane clock offset and drift of the Picos, started by the app
+clock_sync = ClockSync()
 
+# One-shot send on a fresh connection, the app uses the pooled Connection.pool instead
 def sendData(addr, data):
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.connect(addr)
 
-        send.wait()
-
         s.sendall(json.dumps(data).encode('utf-8'))
         s.close()
     except Exception as e:
         print("Error: ",e)
 
+# Listen for sensors on one asyncio event loop instead of a thread per connection
 def start_server(callback, app):
-    def server_thread():
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind((HOST, PORT))
-            s.listen()
-            print(f"Listening on port {PORT}...")
-            while True:
-                conn, addr = s.accept()
-                print(f"Connected by {addr}")
-                threading.Thread(target=receiveData, args=(conn, callback, app), daemon=True).start()
+    from Connection import ingest  # asyncio is only imported once a server starts
+    return ingest.start_server(lambda msg: callback(msg, app), HOST, PORT)
 
-    threading.Thread(target=server_thread, daemon=True).start()
+# Same messages as single datagrams on the same port number, for senders that retransmit until acked
+def start_udp_server(callback, app):
+    from Connection import ingest
+    return ingest.start_udp_server(lambda msg: callback(msg, app), HOST, PORT)
 
-# Handle signals that comes in, can handle rust and python
+# Handle signals that comes in on one socket, can handle rust and python
 def receiveData(conn, callback, app):
+    decoder = FrameDecoder()
+    chunk = bytearray(1024)
+    view = memoryview(chunk)
     with conn:
-        buffer = b""
         while True:
-            chunk = conn.recv(1024)
-            if not chunk:
+            n = conn.recv_into(chunk)
+            if not n:
                 break
-            buffer += chunk
-
-            while True:
-                if len(buffer) == 0:
-                    break
-
-                # --- Case 1: Length-prefixed (Rust) ---
-                if len(buffer) >= 4:
-                    length = int.from_bytes(buffer[:4], "big")
-
-                    if 1 <= length <= 10_000 and len(buffer) >= 4 + length:
-                        json_bytes = buffer[4:4 + length]
-                        buffer = buffer[4 + length:]
-                        try:
-                            msg = json.loads(json_bytes.decode("utf-8"))
-                            callback(msg)
-                        except json.JSONDecodeError:
-                            print("Invalid JSON (Rust format)")
-                        continue
-
-                # --- Case 2: Plain JSON (Python) ---
-                try:
-                    msg = json.loads(buffer.decode("utf-8"))
-                    buffer = b""  # fully consumed
-                    callback(msg, app)
-                except json.JSONDecodeError:
-                    # Wait for more data
-                    break
+            recv_ns = time.perf_counter_ns()
+            errors = decoder.errors
+            msgs = decoder.feed(view[:n])
+            metrics.received(msgs, recv_ns, decoder.errors - errors)
+            for msg in msgs:
+                callback(msg, app)
 
     print("Client disconnected.")
 
-# Take the data from the signal and call action based on the data
-def handle_message(msg, app):
+# Take the data from the signal and apply it to the RaceEngine
+def handle_message(msg, engine):
     print("Received:", msg)
     # label.config(text=f"Message: {msg}")
-    id = msg.get("id")
-    cmd = msg.get("command")
-    time = msg.get("lap_time")
-    swimmer = app.key_map[id]
-    if cmd == "start":
-        tk.SwimTimerApp.start(app)
-    elif cmd == "stop":
-        tk.SwimTimerApp.stop(app)
-    elif cmd == "split":
-        tk.SwimTimerApp.record_lap(app, swimmer)
-    elif cmd == "lap":
-        tk.SwimTimerApp.set_lap(app, time,  swimmer)
+    cmd = msg.get("command") or msg.get("message")
+    lap_time = None
+    if cmd == "lap":
+        # Put the Pico's time on the host timeline before recording it
+        lap_time = clock_sync.lap_time(msg, engine.timer)
+    engine.handle_message(msg, lap_time)
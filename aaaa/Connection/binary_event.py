@@ -0,0 +1,66 @@
+import struct
+from typing import Iterator, Tuple
+
+# Fixed-size binary event sent by lane sensors instead of a JSON object.
+# Only needs struct, so the same file can be copied onto a Pico running MicroPython.
+#
+#   byte 0      MAGIC, never 0x00 (length prefix) or '{' / '[' (plain JSON)
+#   byte 1      VERSION
+#   byte 2      lane id
+#   byte 3      event type
+#   bytes 4-7   sequence number, per sensor
+#   bytes 8-15  timestamp in microseconds on the sensor race clock
+#
+# Everything is big-endian like the 4 byte length prefix.
+MAGIC = 0xB5
+VERSION = 1
+FRAME = struct.Struct(">BBBBIQ")
+SIZE = FRAME.size  # 16 bytes
+
+START = 1
+STOP = 2
+SPLIT = 3
+LAP = 4
+RESET = 5
+
+# Event type <-> "message" value used by the JSON senders
+NAMES = {START: "start", STOP: "stop", SPLIT: "split", LAP: "lap", RESET: "reset"}
+CODES = {name: code for code, name in NAMES.items()}
+
+Event = Tuple[int, int, int, int]  # lane, event type, sequence, timestamp_us
+
+
+def encode(lane: int, event: int, seq: int, timestamp_us: int) -> bytes:
+    return FRAME.pack(MAGIC, VERSION, lane, event, seq & 0xFFFFFFFF, timestamp_us)
+
+
+def encode_into(buffer, offset: int, lane: int, event: int, seq: int, timestamp_us: int):
+    """Write one frame into a preallocated buffer, for senders that reuse one bytearray."""
+    FRAME.pack_into(buffer, offset, MAGIC, VERSION, lane, event, seq & 0xFFFFFFFF, timestamp_us)
+
+
+def decode(buffer, offset: int = 0) -> Event:
+    """Decode the frame at offset, raises ValueError if it is not a version we know."""
+    magic, version, lane, event, seq, timestamp_us = FRAME.unpack_from(buffer, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a v{VERSION} event frame")
+    return lane, event, seq, timestamp_us
+
+
+def decode_all(buffer) -> Iterator[Event]:
+    """Decode back to back frames, the length must be a multiple of SIZE."""
+    for magic, version, lane, event, seq, timestamp_us in FRAME.iter_unpack(buffer):
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a v{VERSION} event frame")
+        yield lane, event, seq, timestamp_us
+
+
+def to_message(lane: int, event: int, seq: int, timestamp_us: int) -> dict:
+    """Turn a decoded frame into the dict handle_message already understands."""
+    return {
+        "id": str(lane),
+        "message": NAMES.get(event, "unknown"),
+        "seq": seq,
+        "timestamp_us": timestamp_us,
+        "lap_time": timestamp_us / 1_000_000,
+    }
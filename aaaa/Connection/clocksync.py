@@ -0,0 +1,149 @@
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from Connection.pool import DeviceError, Preempted
+
+SYNC_INTERVAL = 2.0   # seconds between sync rounds
+SYNC_TIMEOUT = 0.5    # seconds to wait for a device reply
+WINDOW = 32           # samples kept per device
+
+
+# Offset and drift of one device clock against the host clock, NTP style.
+# Each exchange gives four timestamps:
+#   t0 host send, t1 device receive, t2 device send, t3 host receive
+# The lowest-delay half of the window is fitted with a line so the estimate
+# follows the device crystal drifting, not just its offset.
+class ClockEstimator:
+    def __init__(self, window: int = WINDOW):
+        self.samples = deque(maxlen=window)  # (host midpoint ns, device midpoint ns, round trip ns)
+        self.offset_ns = 0      # host - device at ref_ns
+        self.ref_ns = 0         # device time the offset refers to
+        self.drift = 0.0        # host ns gained per device ns, 1e-6 == 1 ppm
+        self.error_ns: Optional[int] = None
+
+    @property
+    def synced(self) -> bool:
+        return self.error_ns is not None
+
+    def add_sample(self, t0: int, t1: int, t2: int, t3: int):
+        round_trip = (t3 - t0) - (t2 - t1)
+        self.samples.append(((t0 + t3) // 2, (t1 + t2) // 2, round_trip))
+        self._fit()
+
+    def _fit(self):
+        best = sorted(self.samples, key=lambda s: s[2])[:max(2, len(self.samples) // 2)]
+        n = len(best)
+        xs = [device for _, device, _ in best]
+        ys = [host - device for host, device, _ in best]
+        ref = sum(xs) // n
+        mean = sum(ys) / n
+
+        var = sum((x - ref) ** 2 for x in xs)
+        slope = sum((x - ref) * (y - mean) for x, y in zip(xs, ys)) / var if var else 0.0
+
+        residual = (sum((y - mean - slope * (x - ref)) ** 2 for x, y in zip(xs, ys)) / n) ** 0.5
+        self.ref_ns = ref
+        self.offset_ns = int(mean)
+        self.drift = slope
+        # Half the fastest round trip bounds the asymmetry we cannot see
+        self.error_ns = int(residual + min(rtt for _, _, rtt in best) / 2)
+
+    def to_host_ns(self, device_ns: int) -> int:
+        return device_ns + self.offset_ns + int(self.drift * (device_ns - self.ref_ns))
+
+    def to_device_ns(self, host_ns: int) -> int:
+        """Inverse of to_host_ns, when a host instant falls on the device clock."""
+        return int((host_ns - self.offset_ns + self.drift * self.ref_ns) / (1 + self.drift))
+
+    def to_host_duration(self, device_seconds: float) -> float:
+        return device_seconds * (1 + self.drift)
+
+
+# Keeps a ClockEstimator per lane and syncs every device in the background.
+# The exchange runs over the pooled command connection of each Pico:
+#   host   -> {"command": "sync", "seq": n}
+#   device -> {"ack": n, "id": "2", "t1": device_us, "t2": device_us}
+class ClockSync:
+    def __init__(self, interval: float = SYNC_INTERVAL):
+        self.interval = interval
+        self.clocks: Dict[str, ClockEstimator] = {}
+        self.lanes: Dict[str, str] = {}  # link name -> lane the device reported
+        self._stop = threading.Event()
+
+    def start(self, pool):
+        """Sync every link of a DevicePool in a background thread."""
+        threading.Thread(target=self._run, args=(pool,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, pool):
+        while not self._stop.is_set():
+            for link in pool:
+                if not link.available:
+                    continue
+                try:
+                    self.sync_once(link)
+                except Preempted:
+                    pass  # a command took the link, this probe is dropped
+                except (DeviceError, ValueError, KeyError) as e:
+                    print("Sync failed: ", e)
+            self._stop.wait(self.interval)
+
+    def sync_once(self, link) -> str:
+        """One exchange with a device, returns the lane it reported."""
+        reply, t0, t3 = link.exchange({"command": "sync"}, SYNC_TIMEOUT, preemptible=True)
+        lane = self.lanes[link.name] = self.add_reply(reply, t0, t3, default_id=link.name)
+        return lane
+
+    def add_reply(self, reply: dict, t0: int, t3: int, default_id: str = "") -> str:
+        lane = str(reply.get("id", default_id))
+        estimator = self.clocks.get(lane)
+        if estimator is None:
+            estimator = self.clocks[lane] = ClockEstimator()
+        estimator.add_sample(t0, int(reply["t1"]) * 1000, int(reply["t2"]) * 1000, t3)
+        return lane
+
+    # --------------------
+    # Mapping sensor times onto the host timeline
+    # --------------------
+    def lap_time(self, msg: dict, timer) -> float:
+        """Elapsed race seconds of a lap message, corrected for the sender's clock.
+
+        A message with "device_us" (device clock at the touch) is mapped exactly,
+        a plain "lap_time" only gets the drift correction.
+        """
+        estimator = self.clocks.get(str(msg.get("id")))
+        if estimator is None or not estimator.synced:
+            return float(msg.get("lap_time"))
+        device_us = msg.get("device_us")
+        if device_us is not None:
+            host_ns = estimator.to_host_ns(int(device_us) * 1000)
+            return timer.to_elapsed_ns(host_ns) / 1_000_000_000
+        return estimator.to_host_duration(float(msg.get("lap_time")))
+
+    def device_us(self, link_name: str, host_ns: int) -> Optional[int]:
+        """A host instant on the clock of the device behind a link, None until it is synced."""
+        estimator = self.clocks.get(self.lanes.get(link_name, link_name))
+        if estimator is None or not estimator.synced:
+            return None
+        return estimator.to_device_ns(host_ns) // 1000
+
+    def report(self) -> Dict[str, dict]:
+        return {
+            lane: {
+                "offset_ms": c.offset_ns / 1e6,
+                "drift_ppm": c.drift * 1e6,
+                "error_ms": None if c.error_ns is None else c.error_ns / 1e6,
+                "samples": len(c.samples),
+            }
+            for lane, c in sorted(self.clocks.items())
+        }
+
+    def print_report(self):
+        for lane, r in self.report().items():
+            print(f"Lane {lane}: offset {r['offset_ms']:.3f} ms, drift {r['drift_ppm']:.1f} ppm, "
+                  f"sync error {r['error_ms']:.3f} ms ({r['samples']} samples)")
+
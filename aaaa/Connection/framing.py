@@ -0,0 +1,179 @@
+import json
+import re
+from typing import List
+
+from Connection import binary_event
+
+MAX_FRAME = 10_000  # largest length-prefixed frame we accept, same limit as before
+
+WHITESPACE = b" \t\r\n"
+OPEN = b"{["
+
+# Structural bytes the plain JSON scanner stops on, everything else is skipped in C
+_OUTSIDE_STRING = re.compile(rb'["{}\[\]]')
+_INSIDE_STRING = re.compile(rb'["\\]')
+
+
+# Streaming decoder for the sensor wire protocol, can handle rust and python:
+#   - length-prefixed: 4 byte big-endian length + JSON body (Rust client)
+#   - plain JSON: objects written back to back with no framing (Python scripts)
+#   - binary events: fixed 16 byte frames starting with binary_event.MAGIC
+# Data is appended to one bytearray and parsed through a memoryview, consumed
+# bytes are dropped and a plain JSON value that arrives in pieces is scanned
+# from where the previous chunk stopped, so nothing is parsed twice.
+class FrameDecoder:
+    def __init__(self, max_frame: int = MAX_FRAME):
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+        self.errors = 0
+
+        # Position of the first unconsumed byte
+        self.pos = 0
+        # Scanner state for a plain JSON value that is not complete yet
+        self.scan = 0
+        self.depth = 0
+        self.in_string = False
+
+    @property
+    def pending(self) -> int:
+        """Number of bytes received but not decoded yet."""
+        return len(self.buffer) - self.pos
+
+    def reset(self):
+        self.buffer.clear()
+        self.pos = 0
+        self._reset_scan()
+
+    def feed(self, data) -> List[dict]:
+        """Add received bytes and return every message they complete, in order."""
+        self.buffer += data
+        messages: List[dict] = []
+        with memoryview(self.buffer) as view:
+            self._parse(view, messages)
+
+        # Drop consumed bytes, only the unfinished tail stays in the buffer
+        if self.pos:
+            del self.buffer[:self.pos]
+            if self.depth:
+                self.scan -= self.pos
+            self.pos = 0
+        return messages
+
+    # --------------------
+    # Parsing
+    # --------------------
+    def _parse(self, view: memoryview, messages: List[dict]):
+        buffer = self.buffer
+        size = len(buffer)
+
+        while self.pos < size:
+            # Continue a plain JSON value from an earlier chunk
+            if self.depth:
+                end = self._scan_json(size)
+                if end < 0:
+                    return
+                self._decode(view[self.pos:end], messages, "Invalid JSON (Python format)")
+                self.pos = end
+                continue
+
+            first = buffer[self.pos]
+
+            # --- Case 1: Length-prefixed (Rust) ---
+            if first == 0:
+                if size - self.pos < 4:
+                    return
+                length = int.from_bytes(view[self.pos:self.pos + 4], "big")
+                if not 1 <= length <= self.max_frame:
+                    # Not a frame we understand, skip a byte and resync
+                    print("Invalid frame length:", length)
+                    self.errors += 1
+                    self.pos += 1
+                    continue
+                end = self.pos + 4 + length
+                if end > size:
+                    return  # wait for the rest of the frame
+                self._decode(view[self.pos + 4:end], messages, "Invalid JSON (Rust format)")
+                self.pos = end
+
+            # --- Case 2: Binary event (lane sensors) ---
+            elif first == binary_event.MAGIC:
+                if size - self.pos < binary_event.SIZE:
+                    return
+                try:
+                    event = binary_event.decode(buffer, self.pos)
+                except ValueError:
+                    print("Unknown event frame version:", buffer[self.pos + 1])
+                    self.errors += 1
+                    self.pos += 1
+                    continue
+                messages.append(binary_event.to_message(*event))
+                self.pos += binary_event.SIZE
+
+            # --- Case 3: Plain JSON (Python) ---
+            elif first in OPEN:
+                self.scan = self.pos
+                end = self._scan_json(size)
+                if end < 0:
+                    return
+                self._decode(view[self.pos:end], messages, "Invalid JSON (Python format)")
+                self.pos = end
+
+            elif first in WHITESPACE:
+                self.pos += 1
+
+            else:
+                print("Unexpected byte:", first)
+                self.errors += 1
+                self.pos += 1
+
+    def _scan_json(self, size: int) -> int:
+        """Advance the scanner, return the end of the value or -1 if it needs more data."""
+        buffer = self.buffer
+        i = self.scan
+        while i < size:
+            if self.in_string:
+                match = _INSIDE_STRING.search(buffer, i)
+                if match is None:
+                    i = size
+                    break
+                i = match.start()
+                if buffer[i] == 0x5c:  # backslash, skip the escaped byte
+                    if i + 1 >= size:
+                        break
+                    i += 2
+                    continue
+                self.in_string = False
+                i += 1
+                continue
+
+            match = _OUTSIDE_STRING.search(buffer, i)
+            if match is None:
+                i = size
+                break
+            i = match.start()
+            byte = buffer[i]
+            i += 1
+            if byte == 0x22:  # "
+                self.in_string = True
+            elif byte in OPEN:
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    self._reset_scan()
+                    return i
+
+        self.scan = i
+        return -1
+
+    def _reset_scan(self):
+        self.scan = 0
+        self.depth = 0
+        self.in_string = False
+
+    def _decode(self, body: memoryview, messages: List[dict], error: str):
+        try:
+            messages.append(json.loads(str(body, "utf-8")))
+        except ValueError:
+            print(error)
+            self.errors += 1
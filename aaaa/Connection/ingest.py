@@ -0,0 +1,223 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+from Connection.framing import FrameDecoder
+from Monitor.metrics import metrics
+
+HOST = '0.0.0.0'
+PORT = 5000
+
+MAX_CONNECTIONS = 2048     # sensors connected at the same time, extra ones are refused
+IDLE_TIMEOUT = 30.0        # seconds without data before a sensor connection is dropped
+READ_SIZE = 1024           # bytes per read, same as the old recv(1024)
+MAX_BUFFER = 64 * 1024     # unparsed bytes kept per connection before it is dropped
+BACKLOG = 1024
+
+MAX_DATAGRAM = 65535       # one UDP datagram carries whole frames, never part of one
+DEDUP_WINDOW = 10.0        # seconds a (device, seq) pair is remembered, retransmits come well within it
+
+
+# Asyncio replacement for the thread-per-connection listener.
+# One event loop runs in one daemon thread and every sensor gets a coroutine,
+# so reconnecting touchpads and Picos no longer pile up OS threads.
+class IngestServer:
+    def __init__(self, on_message, host: str = HOST, port: int = PORT,
+                 max_connections: int = MAX_CONNECTIONS, idle_timeout: float = IDLE_TIMEOUT):
+        self.on_message = on_message
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+
+        self.active = 0
+        self.refused = 0
+        self.timed_out = 0
+
+        self.loop: asyncio.AbstractEventLoop = None
+        self.server: asyncio.AbstractServer = None
+        self.ready = threading.Event()
+        self.error: Exception = None
+
+    # --------------------
+    # Lifecycle
+    # --------------------
+    def start(self):
+        """Run the event loop in a daemon thread and return once it is listening."""
+        threading.Thread(target=self.run, daemon=True).start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.serve())
+        except OSError as e:
+            # bind failed, let start() report it
+            self.error = e
+        finally:
+            self.ready.set()
+            self.loop.close()
+
+    async def serve(self):
+        self.server = await asyncio.start_server(
+            self.handle_client, self.host, self.port, backlog=BACKLOG
+        )
+        print(f"Listening on port {self.port}...")
+        self.ready.set()
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def stop(self):
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    # --------------------
+    # Connections
+    # --------------------
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info("peername")
+        if self.active >= self.max_connections:
+            self.refused += 1
+            writer.close()
+            return
+
+        self.active += 1
+        decoder = FrameDecoder()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(reader.read(READ_SIZE), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    print(f"Idle timeout {addr}")
+                    break
+                if not chunk:
+                    break
+                recv_ns = time.perf_counter_ns()
+                errors = decoder.errors
+                msgs = decoder.feed(chunk)
+                metrics.received(msgs, recv_ns, decoder.errors - errors)
+                for msg in msgs:
+                    self.on_message(msg)
+                if decoder.pending > MAX_BUFFER:
+                    print(f"Dropping {addr}: unparsed data over {MAX_BUFFER} bytes")
+                    break
+        except (ConnectionError, OSError) as e:
+            print("Error: ", e)
+        finally:
+            self.active -= 1
+            writer.close()
+
+
+def start_server(on_message, host: str = HOST, port: int = PORT, **kwargs) -> IngestServer:
+    """Drop-in for the old threaded start_server, on_message gets one decoded dict."""
+    return IngestServer(on_message, host, port, **kwargs).start()
+
+
+# Remembers which (device, seq) pairs arrived in the last window seconds.
+# Pairs expire by age rather than by count, so a device that reboots and
+# starts its sequence over is not mistaken for a retransmit.
+class Deduplicator:
+    def __init__(self, window: float = DEDUP_WINDOW, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self.seen = set()
+        self.order = deque()  # (when, (device, seq)) oldest first
+        self.duplicates = 0
+
+    def first(self, device, seq) -> bool:
+        """True the first time a pair is seen, False for a repeat."""
+        now = self.clock()
+        order = self.order
+        while order and now - order[0][0] > self.window:
+            self.seen.discard(order.popleft()[1])
+        key = (device, seq)
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen.add(key)
+        order.append((now, key))
+        return True
+
+
+# Datagram listener next to the TCP server, a touch is one sendto() with no
+# connection to open or close. Each datagram holds one or more whole frames in
+# any format FrameDecoder reads. Messages with a "seq" are acked back to the
+# sender, so a sensor can send again until it hears the ack, and repeats of a
+# (device, seq) pair are dropped before they reach on_message. A message without
+# a "device" field is keyed on the sender's (ip, port), never on its lane id:
+# two sensors on one lane count their seqs apart and must not drop each other.
+class UdpIngest:
+    def __init__(self, on_message, host: str = HOST, port: int = PORT, window: float = DEDUP_WINDOW):
+        self.on_message = on_message
+        self.host = host
+        self.port = port
+        self.dedup = Deduplicator(window)
+        self.sock: socket.socket = None
+
+        self.datagrams = 0
+        self.dropped = 0   # datagrams that ended in the middle of a frame
+
+    def start(self):
+        """Bind and serve from a daemon thread, a bind error is raised here."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((self.host, self.port))
+        threading.Thread(target=self.run, daemon=True, name="udp-ingest").start()
+        print(f"Listening for datagrams on port {self.port}...")
+        return self
+
+    def stop(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def run(self):
+        sock = self.sock
+        buffer = bytearray(MAX_DATAGRAM)
+        view = memoryview(buffer)
+        decoder = FrameDecoder()
+        while True:
+            try:
+                n, addr = sock.recvfrom_into(buffer)
+            except OSError:
+                break  # closed by stop()
+            recv_ns = time.perf_counter_ns()
+            self.datagrams += 1
+            errors = decoder.errors
+            msgs = decoder.feed(view[:n])
+            if decoder.pending:
+                # The rest of that frame is not coming in another datagram
+                decoder.reset()
+                decoder.errors += 1
+                self.dropped += 1
+            metrics.received(msgs, recv_ns, decoder.errors - errors)
+            for msg in msgs:
+                self.deliver(msg, addr)
+
+    def deliver(self, msg: dict, addr):
+        seq = msg.get("seq")
+        if seq is None:
+            self.on_message(msg)
+            return
+        device = msg.get("device") or addr
+        if self.dedup.first(device, seq):
+            self.on_message(msg)
+        # Repeats are acked too, the first ack may be the one that got lost
+        try:
+            self.sock.sendto(json.dumps({"ack": seq, "id": msg.get("id")}).encode("utf-8"), addr)
+        except OSError as e:
+            print("Error: ", e)
+
+
+def start_udp_server(on_message, host: str = HOST, port: int = PORT, **kwargs) -> UdpIngest:
+    """Same messages as start_server, one datagram per touch."""
+    return UdpIngest(on_message, host, port, **kwargs).start()
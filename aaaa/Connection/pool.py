@@ -0,0 +1,231 @@
+import itertools
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+
+from Connection.framing import FrameDecoder
+
+CONNECT_TIMEOUT = 0.5   # seconds
+ACK_DEADLINE = 0.05     # seconds every device gets to ack a broadcast
+BACKOFF_MIN = 0.1       # seconds before the first reconnect attempt
+BACKOFF_MAX = 5.0
+PREEMPT_POLL = 0.002    # seconds a preemptible exchange waits between checks for a command
+
+_seq = itertools.count(1)
+
+
+class DeviceError(Exception):
+    pass
+
+
+# A preemptible exchange gave the link up to a command, the connection stays open
+class Preempted(DeviceError):
+    pass
+
+
+# One long-lived TCP connection to a Pico.
+# Every request carries a "seq" and the device answers with {"ack": seq, ...},
+# a broken connection is dropped and reopened on the next request after a backoff.
+# Clock sync holds the link for a whole probe, up to its 0.5 s timeout, longer
+# than a broadcast waits for it. Its exchanges are preemptible: they check every
+# PREEMPT_POLL whether a command is waiting and give the link up if so. The late
+# sync ack is skipped by seq when the command reads its own.
+class DeviceLink:
+    def __init__(self, addr, clock=time.perf_counter_ns):
+        self.addr = addr
+        self.clock = clock
+        self.sock: Optional[socket.socket] = None
+        self.decoder = FrameDecoder()
+        self.lock = threading.Lock()
+        self._waiting = 0   # commands waiting for the lock
+        self._waiting_lock = threading.Lock()
+
+        self.backoff = BACKOFF_MIN
+        self.retry_at = 0.0
+        self.rtt_ns: Optional[int] = None
+        self.failures = 0
+        self.timeouts = 0   # acks that missed their deadline, the connection is kept
+
+    @property
+    def name(self) -> str:
+        return f"{self.addr[0]}:{self.addr[1]}"
+
+    @property
+    def connected(self) -> bool:
+        return self.sock is not None
+
+    @property
+    def available(self) -> bool:
+        """Connected, or the reconnect backoff has run out."""
+        return self.sock is not None or time.monotonic() >= self.retry_at
+
+    def _connect(self):
+        if self.sock is not None:
+            return
+        if time.monotonic() < self.retry_at:
+            raise DeviceError(f"{self.name} down, retrying in {self.retry_at - time.monotonic():.1f}s")
+        try:
+            sock = socket.create_connection(self.addr, timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            self.failures += 1
+            self.retry_at = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+            raise DeviceError(f"{self.name} connect failed: {e}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.decoder.reset()
+        self.backoff = BACKOFF_MIN
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def connect(self):
+        with self.lock:
+            self._connect()
+
+    def exchange(self, data: dict, timeout: float, preemptible: bool = False) -> Tuple[dict, int, int]:
+        """Send one message and wait for its ack, returns (reply, send ns, receive ns).
+
+        A preemptible exchange raises Preempted as soon as a command wants the link.
+        """
+        if preemptible:
+            acquired = self.lock.acquire(timeout=timeout)
+        else:
+            with self._waiting_lock:
+                self._waiting += 1
+            try:
+                acquired = self.lock.acquire(timeout=timeout)
+            finally:
+                with self._waiting_lock:
+                    self._waiting -= 1
+        if not acquired:
+            raise DeviceError(f"{self.name} busy")
+        try:
+            if preemptible and self._waiting:
+                raise Preempted(f"{self.name} wanted by a command")
+            self._connect()
+            seq = next(_seq)
+            payload = json.dumps(dict(data, seq=seq)).encode("utf-8") + b"\n"
+            sent = False
+            try:
+                self.sock.settimeout(PREEMPT_POLL if preemptible else timeout)
+                t0 = self.clock()
+                self.sock.sendall(payload)
+                sent = True
+                reply = self._read_ack(seq, time.monotonic() + timeout, preemptible)
+                t3 = self.clock()
+            except socket.timeout:
+                if not sent:
+                    # The send itself stalled, the stream may hold half a message
+                    self.failures += 1
+                    self.close()
+                    raise DeviceError(f"{self.name}: send timed out")
+                # A slow ack is not a broken link, a late one is skipped by seq next time
+                self.timeouts += 1
+                raise DeviceError(f"{self.name}: no ack within {timeout * 1000:.0f} ms")
+            except (OSError, ValueError) as e:
+                self.failures += 1
+                self.close()
+                raise DeviceError(f"{self.name}: {e}")
+            self.rtt_ns = t3 - t0
+            return reply, t0, t3
+        finally:
+            self.lock.release()
+
+    def _read_ack(self, seq: int, deadline: float, preemptible: bool = False) -> dict:
+        while True:
+            if preemptible and self._waiting:
+                raise Preempted(f"{self.name} wanted by a command")
+            try:
+                chunk = self.sock.recv(1024)
+            except socket.timeout:
+                # Only a preemptible read polls, anything else has timed out
+                if not preemptible or time.monotonic() >= deadline:
+                    raise
+                continue
+            if not chunk:
+                raise ValueError("connection closed")
+            for msg in self.decoder.feed(chunk):
+                if msg.get("ack") == seq:
+                    return msg
+
+
+# Keeps one DeviceLink per Pico and fans commands out to all of them at once
+class DevicePool:
+    def __init__(self, addrs, clock=time.perf_counter_ns):
+        self.links: Dict[tuple, DeviceLink] = {addr: DeviceLink(addr, clock) for addr in addrs}
+        self.workers = ThreadPoolExecutor(max_workers=max(1, len(self.links)), thread_name_prefix="pico")
+        # Broadcasts from the Tk thread run here one after another, so start/stop keep their order
+        self.sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pico-broadcast")
+
+    def __iter__(self):
+        return iter(self.links.values())
+
+    def connect_all(self):
+        """Open every connection in the background so the first start does not pay for it."""
+        for link in self:
+            self.workers.submit(self._try_connect, link)
+
+    @staticmethod
+    def _try_connect(link: DeviceLink):
+        try:
+            link.connect()
+        except DeviceError as e:
+            print("Error: ", e)
+
+    def broadcast(self, data: dict, deadline: float = ACK_DEADLINE,
+                  extra: Optional[Callable[[DeviceLink], dict]] = None) -> Dict[str, Optional[float]]:
+        """Send to every device in parallel, returns round trip ms per device or None if not acked.
+
+        extra(link) adds fields for one device, e.g. a time on that device's clock.
+        """
+        if not self.links:
+            return {}
+        futures = {self.workers.submit(link.exchange, dict(data, **extra(link)) if extra else data, deadline): link
+                   for link in self}
+        done, _ = wait(futures, timeout=deadline)
+
+        results: Dict[str, Optional[float]] = {}
+        for future, link in futures.items():
+            if future in done and future.exception() is None:
+                _, t0, t3 = future.result()
+                results[link.name] = (t3 - t0) / 1e6
+            else:
+                if future in done:
+                    print("Error: ", future.exception())
+                results[link.name] = None
+
+        acked = [ms for ms in results.values() if ms is not None]
+        detail = ", ".join(f"{name} {'-' if ms is None else f'{ms:.2f} ms'}" for name, ms in results.items())
+        print(f"{data.get('command')}: acked by {len(acked)}/{len(results)} ({detail})")
+        return results
+
+    def broadcast_async(self, data: dict, deadline: float = ACK_DEADLINE,
+                        extra: Optional[Callable[[DeviceLink], dict]] = None):
+        """Same as broadcast without blocking the caller, returns a Future."""
+        return self.sender.submit(self.broadcast, data, deadline, extra)
+
+    def report(self) -> Dict[str, dict]:
+        return {
+            link.name: {
+                "connected": link.connected,
+                "rtt_ms": None if link.rtt_ns is None else link.rtt_ns / 1e6,
+                "failures": link.failures,
+            "timeouts": link.timeouts,
+            }
+            for link in self
+        }
+
+    def close(self):
+        for link in self:
+            link.close()
+        self.workers.shutdown(wait=False)
+        self.sender.shutdown(wait=False)
@@ -0,0 +1,270 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9100
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+SUB_BITS = 4            # 16 sub-buckets per power of two, about 6% resolution
+MAX_VALUE = 1 << 40     # ns, about 18 minutes, longer values land in the last bucket
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+RATE_WINDOW = 10        # seconds the event rate is averaged over
+
+# Where a sensor message is timestamped on its way to the scoreboard:
+#   recv      bytes read from the socket
+#   decode    frame parsed into a message
+#   dispatch  handed to the engine on the Tk loop
+#   update    labels of the batch set
+STAGES = {
+    "decode": "recv to decoded",
+    "queue": "decoded to dispatched on the Tk loop",
+    "apply": "dispatched to labels updated",
+    "total": "recv to labels updated",
+}
+
+
+# Log-linear histogram of integer nanoseconds in the spirit of HdrHistogram.
+# Values below 2 ** (SUB_BITS + 1) get a bucket each, above that every power of
+# two is split into 2 ** SUB_BITS buckets. Recording is one list increment with
+# no lock: every thread that records gets its own shard through a
+# threading.local, "decode" has two writers (the asyncio loop and the UDP
+# thread) and each only ever touches its own counts. Readers add the shards up.
+class Histogram:
+    def __init__(self):
+        self.size = _index(MAX_VALUE) + 1
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()  # only taken to add a shard, once per thread
+
+    def _shard(self) -> "_Shard":
+        shard = _Shard(self.size)
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def record(self, value: int):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        if value < 0:
+            value = 0
+        elif value > MAX_VALUE:
+            value = MAX_VALUE
+        # _index inlined, this runs for every message at every stage
+        shift = value.bit_length() - SUB_BITS - 1
+        shard.counts[(shift << SUB_BITS) + (value >> shift) if shift > 0 else value] += 1
+        shard.count += 1
+        shard.sum += value
+
+    # --------------------
+    # Reads, merged over the shards
+    # --------------------
+    @property
+    def counts(self) -> List[int]:
+        merged = [0] * self.size
+        for shard in list(self._shards):
+            for i, n in enumerate(list(shard.counts)):
+                if n:
+                    merged[i] += n
+        return merged
+
+    @property
+    def count(self) -> int:
+        return sum(shard.count for shard in list(self._shards))
+
+    @property
+    def sum(self) -> int:
+        return sum(shard.sum for shard in list(self._shards))
+
+    def percentile(self, q: float) -> int:
+        """Upper edge of the bucket holding the q quantile, 0 when empty."""
+        counts = self.counts
+        total = sum(counts)
+        if not total:
+            return 0
+        rank = max(1, int(q * total + 0.5))
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                return _upper(i)
+        return MAX_VALUE
+
+    def reset(self):
+        # Writers pick up a fresh shard on their next record
+        with self._lock:
+            self._local = threading.local()
+            self._shards = []
+
+
+# One writer thread's counts of a Histogram
+class _Shard:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0
+
+
+def _index(value: int) -> int:
+    bits = value.bit_length()
+    if bits <= SUB_BITS + 1:
+        return value
+    shift = bits - SUB_BITS - 1
+    return (shift << SUB_BITS) + (value >> shift)
+
+
+def _upper(index: int) -> int:
+    if index < 1 << (SUB_BITS + 1):
+        return index
+    shift = (index >> SUB_BITS) - 1
+    return ((index - (shift << SUB_BITS) + 1) << shift) - 1
+
+
+# Everything the ingest path measures, one instance per process.
+# The socket side calls received(), the Tk loop dispatched() and updated(),
+# stage timestamps travel in the message dict as _recv_ns/_decode_ns/_dispatch_ns.
+class Metrics:
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.stages: Dict[str, Histogram] = {name: Histogram() for name in STAGES}
+        self.messages: Dict[Tuple[str, str], int] = defaultdict(int)  # (type, lane) -> count
+        self.parse_errors = 0
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+        # Messages dispatched per second for the last RATE_WINDOW seconds
+        self._rate_counts = [0] * RATE_WINDOW
+        self._rate_seconds = [0] * RATE_WINDOW
+
+    # --------------------
+    # Recording
+    # --------------------
+    def received(self, msgs: List[dict], recv_ns: int, errors: int = 0):
+        """Messages decoded from one read that arrived at recv_ns."""
+        decode_ns = self.clock()
+        hist = self.stages["decode"]
+        for msg in msgs:
+            msg["_recv_ns"] = recv_ns
+            msg["_decode_ns"] = decode_ns
+            hist.record(decode_ns - recv_ns)
+        if errors:
+            self.parse_errors += errors
+
+    def dispatched(self, msg: dict):
+        now = self.clock()
+        msg["_dispatch_ns"] = now
+        decode_ns = msg.get("_decode_ns")
+        if decode_ns is not None:
+            self.stages["queue"].record(now - decode_ns)
+
+        kind = str(msg.get("command") or msg.get("message"))
+        self.messages[(kind, str(msg.get("id")))] += 1
+
+        second = now // 1_000_000_000
+        slot = second % RATE_WINDOW
+        if self._rate_seconds[slot] != second:
+            self._rate_seconds[slot] = second
+            self._rate_counts[slot] = 0
+        self._rate_counts[slot] += 1
+
+    def updated(self, msgs: List[dict]):
+        """The labels touched by msgs are set."""
+        now = self.clock()
+        apply, total = self.stages["apply"], self.stages["total"]
+        for msg in msgs:
+            dispatch_ns = msg.get("_dispatch_ns")
+            if dispatch_ns is not None:
+                apply.record(now - dispatch_ns)
+            recv_ns = msg.get("_recv_ns")
+            if recv_ns is not None:
+                total.record(now - recv_ns)
+
+    def event_rate(self) -> float:
+        """Messages per second over the last complete RATE_WINDOW seconds."""
+        current = self.clock() // 1_000_000_000
+        return sum(n for n, s in zip(self._rate_counts, self._rate_seconds)
+                   if current - RATE_WINDOW <= s < current) / RATE_WINDOW
+
+    # --------------------
+    # Prometheus text format
+    # --------------------
+    def render(self) -> str:
+        lines = []
+        for name, help_text in STAGES.items():
+            hist = self.stages[name]
+            metric = f"swimtimer_{name}_latency_seconds"
+            lines.append(f"# HELP {metric} Sensor message latency, {help_text}.")
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {hist.percentile(q) / 1e9:.9f}')
+            lines.append(f"{metric}_sum {hist.sum / 1e9:.9f}")
+            lines.append(f"{metric}_count {hist.count}")
+
+        lines.append("# HELP swimtimer_messages_total Sensor messages dispatched by type and lane.")
+        lines.append("# TYPE swimtimer_messages_total counter")
+        for (kind, lane), n in sorted(list(self.messages.items())):  # copied in one step, the Tk thread adds keys
+            lines.append(f'swimtimer_messages_total{{type="{kind}",lane="{lane}"}} {n}')
+
+        lines.append("# HELP swimtimer_parse_errors_total Bytes or frames the decoder could not parse.")
+        lines.append("# TYPE swimtimer_parse_errors_total counter")
+        lines.append(f"swimtimer_parse_errors_total {self.parse_errors}")
+
+        lines.append(f"# HELP swimtimer_event_rate Messages dispatched per second over {RATE_WINDOW}s.")
+        lines.append("# TYPE swimtimer_event_rate gauge")
+        lines.append(f"swimtimer_event_rate {self.event_rate():.3f}")
+
+        for name, read in sorted(self.gauges.items()):
+            try:
+                value = float(read())
+            except Exception as e:
+                print("Error: ", e)
+                continue
+            lines.append(f"# TYPE swimtimer_{name} gauge")
+            lines.append(f"swimtimer_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --------------------
+# HTTP endpoint for processes without Flask
+# --------------------
+def serve(registry: Metrics = metrics, host: str = METRICS_HOST, port: int = METRICS_PORT,
+          routes: Dict[str, Callable[[], str]] = None) -> "ThreadingHTTPServer":
+    """Serve GET /metrics, and any extra routes, from a daemon thread."""
+    # Imported here, http.server costs about 30 ms that only a process serving metrics should pay
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    routes = dict(routes or {})  # extra GET paths answered with plain text
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                body = registry.render()
+            elif path in routes:
+                body = routes[path]()
+            else:
+                self.send_error(404)
+                return
+            body = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # no line per scrape
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,65 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+
+# Where the time to the first frame goes: imports, then each init phase of
+# main, then the first frame Tk draws. Entry points import this before
+# anything else so the clock starts with them, and print report() when
+# started with --startup-report. Marks can come from any thread.
+class StartupTimer:
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.started = clock()
+        self.last = self.started
+        self.phases: List[Tuple[str, int, int]] = []  # (name, ns it took, ns from start when it ended)
+
+    def mark(self, name: str):
+        """End a phase that began where the previous one ended."""
+        now = self.clock()
+        self.phases.append((name, now - self.last, now - self.started))
+        self.last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        begin = self.clock()
+        try:
+            yield
+        finally:
+            now = self.clock()
+            self.phases.append((name, now - begin, now - self.started))
+            self.last = now
+
+    def first_frame(self, root, then=None):
+        """Mark the first frame once Tk has drawn the window, then call then()."""
+        def drawn():
+            root.update_idletasks()
+            self.mark("first frame")
+            if then is not None:
+                then()
+        root.after_idle(drawn)
+
+    def report(self) -> str:
+        lines = ["Startup:"]
+        interpreter = interpreter_ns()
+        if interpreter is not None:
+            lines.append(f"  {'python start':<24}{interpreter / 1e6:9.1f} ms  (before the entry point ran)")
+        for name, took, at in self.phases:
+            lines.append(f"  {name:<24}{took / 1e6:9.1f} ms  at {at / 1e6:8.1f} ms")
+        return "\n".join(lines)
+
+
+def interpreter_ns() -> Optional[int]:
+    """How long the process ran before this module was imported, Linux only, 10 ms resolution."""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        boot_ns = time.clock_gettime_ns(time.CLOCK_BOOTTIME)
+    except (OSError, AttributeError, IndexError, ValueError):
+        return None
+    return max(0, boot_ns - ticks * 1_000_000_000 // os.sysconf("SC_CLK_TCK") - (time.perf_counter_ns() - _imported))
+
+
+_imported = time.perf_counter_ns()
+startup = StartupTimer()
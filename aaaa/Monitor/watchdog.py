@@ -0,0 +1,216 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional
+
+from Monitor.metrics import metrics
+
+LAG_THRESHOLD_MS = 100   # a callback this late, or a handler running this long, gets logged
+HEARTBEAT_MS = 20        # how often the watchdog's own callback asks to run
+LAG_SAMPLES = 2000       # lag samples kept for the rolling distribution
+SAMPLE_INTERVAL = 0.005  # seconds between profiler samples
+PROFILE_DIR = "profiles"
+
+
+# Measures how late root.after callbacks fire and who keeps the Tk loop busy.
+# install() wraps root.after, so update_timer, countdown and the event queue are
+# all timed: lateness goes into a rolling distribution and a callback that runs
+# longer than the threshold is logged by name. A monitor thread also watches a
+# heartbeat callback and, while the loop is stuck, logs the stack of the Tk
+# thread, which catches key handlers and anything else not started by after().
+class LagWatchdog:
+    def __init__(self, root, threshold_ms: float = LAG_THRESHOLD_MS, heartbeat_ms: int = HEARTBEAT_MS):
+        self.root = root
+        self.threshold_ns = int(threshold_ms * 1e6)
+        self.heartbeat_ms = heartbeat_ms
+
+        self.lags = deque(maxlen=LAG_SAMPLES)   # (callback name, lag ns)
+        self.stalls = deque(maxlen=50)           # (when, ms, where) of the last stalls
+        self.late = Counter()                    # callback name -> times late over the threshold
+        self.tk_thread: Optional[int] = None
+        self._after = None
+        self._last_beat = time.perf_counter_ns()
+        self._stop = threading.Event()
+
+    def install(self):
+        """Wrap root.after and start watching, call from the Tk thread."""
+        self.tk_thread = threading.get_ident()
+        self._after = self.root.after
+        self.root.after = self.after
+        self._after(self.heartbeat_ms, self._beat, time.perf_counter_ns() + self.heartbeat_ms * 1_000_000)
+        threading.Thread(target=self._monitor, daemon=True).start()
+        metrics.gauges["tk_lag_p99_ms"] = lambda: self.percentile(0.99) / 1e6
+        metrics.gauges["tk_lag_max_ms"] = lambda: self.percentile(1.0) / 1e6
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._after is not None:
+            self.root.after = self._after
+
+    # Same signature as Tk's after
+    def after(self, ms, func=None, *args):
+        if func is None:
+            return self._after(ms)
+        due = time.perf_counter_ns() + int(ms) * 1_000_000
+        return self._after(ms, self._run, due, func, args)
+
+    def _run(self, due: int, func, args):
+        start = time.perf_counter_ns()
+        name = getattr(func, "__qualname__", repr(func))
+        lag = start - due
+        self.lags.append((name, lag))
+        if lag > self.threshold_ns:
+            self.late[name] += 1
+        try:
+            return func(*args)
+        finally:
+            took = time.perf_counter_ns() - start
+            if took > self.threshold_ns:
+                self._stall(took, name)
+
+    # --------------------
+    # Heartbeat
+    # --------------------
+    def _beat(self, due: int):
+        now = time.perf_counter_ns()
+        self.lags.append(("heartbeat", now - due))
+        self._last_beat = now
+        if not self._stop.is_set():
+            self._after(self.heartbeat_ms, self._beat, now + self.heartbeat_ms * 1_000_000)
+
+    def _monitor(self):
+        reported = None
+        while not self._stop.wait(self.heartbeat_ms / 1000):
+            beat = self._last_beat
+            stuck = time.perf_counter_ns() - beat
+            # Log a stall once, with what the Tk thread is doing while it lasts
+            if stuck > self.threshold_ns + self.heartbeat_ms * 1_000_000 and reported != beat:
+                reported = beat
+                self._stall(stuck, self.where())
+
+    def where(self) -> str:
+        """Innermost frames of the Tk thread right now."""
+        frame = sys._current_frames().get(self.tk_thread)
+        if frame is None:
+            return "?"
+        stack = traceback.extract_stack(frame)[-4:]
+        return " <- ".join(f"{os.path.basename(f.filename)}:{f.lineno} {f.name}" for f in reversed(stack))
+
+    def _stall(self, ns: int, where: str):
+        self.stalls.append((time.time(), ns / 1e6, where))
+        print(f"Tk loop blocked {ns / 1e6:.0f} ms: {where}")
+
+    # --------------------
+    # Reads
+    # --------------------
+    def percentile(self, q: float) -> int:
+        values = sorted(lag for _, lag in list(self.lags))
+        if not values:
+            return 0
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def report(self) -> str:
+        late = ", ".join(f"{name} x{n}" for name, n in self.late.most_common(5)) or "none"
+        return (f"Tk lag p50 {self.percentile(0.5) / 1e6:.1f} ms, p99 {self.percentile(0.99) / 1e6:.1f} ms, "
+                f"max {self.percentile(1.0) / 1e6:.1f} ms, {len(self.stalls)} stalls, late: {late}")
+
+
+# Statistical profiler over sys._current_frames, no tracing hooks so the race
+# keeps running at full speed while it records. Stacks are written in the
+# collapsed "frame;frame;frame count" format that flame graph tools read.
+class SamplingProfiler:
+    def __init__(self, interval: float = SAMPLE_INTERVAL, directory: str = PROFILE_DIR):
+        self.interval = interval
+        self.directory = directory
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        print("Profiler started")
+
+    def stop(self) -> Optional[str]:
+        """Stop sampling and write the profile, returns its path."""
+        if not self.running:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        path = self.write()
+        print(f"Profiler stopped, {self.samples} samples in {path}")
+        return path
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def _sample(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n: int = 15) -> List[tuple]:
+        """(frame, samples it was the innermost frame of) for the busiest frames."""
+        leaf = Counter()
+        for stack, count in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        return leaf.most_common(n)
+
+    def write(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S.txt", time.localtime(self.started)))
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+profiler = SamplingProfiler()
+
+
+def profile_routes(p: SamplingProfiler = profiler) -> Dict[str, Callable[[], str]]:
+    """GET /profile/start and /profile/stop for Monitor.metrics.serve."""
+    def start():
+        p.start()
+        return "profiling\n"
+
+    def stop():
+        path = p.stop()
+        if path is None:
+            return "not profiling\n"
+        return f"{path}\n" + "".join(f"{count:6d} {frame}\n" for frame, count in p.top())
+
+    return {"/profile/start": start, "/profile/stop": stop}
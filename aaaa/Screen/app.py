@@ -1,18 +1,29 @@
+from Monitor.startup import startup  # first, so the startup report covers every import below
+
 import tkinter as tk
-import time
-from typing import Dict, List, Optional
+from typing import Dict, Optional
+from contextlib import contextmanager
 import threading
-import socket
-import json
-import pygame
+import os
+import sys
 
 from Connection import MicrocontrollerConnection as mConn
-from Timer import timer
+from Connection.pool import DevicePool
+from Timer import timer, lapstore
+from Timer.engine import RaceEngine, ARMED, START, STOP, RESET, RESTORE, LAP
+from Timer.standings import Standings
+from Timer.start import StartScheduler, COUNTDOWN
+from Audio.start_signal import NullSignal, LazySignal
+from Screen.dispatch import EventQueue
+from Monitor.metrics import serve as serve_metrics
+from Monitor.watchdog import LagWatchdog, profiler, profile_routes
+from Storage import journal
+from Storage.archive import ArchiveWriter, RaceRecorder
+from Screen.board import make_board, SPLITS_SHOWN
+from Screen.render import LabelRenderer, REFRESH_MS, format_clock, format_seconds
 
 HOST = '0.0.0.0'  # Listen on all interfaces
 PORT = 5000      # Port to listen on
-pygame.mixer.init()
-pygame.mixer.music.load("music/start.mp3")
 
 PICO_IP = '10.42.0.225'
 PO = 6000
@@ -20,76 +31,67 @@ pico_addr = {
     # ("10.42.0.39", 6000),
     # ("10.42.0.225", 6000)
 }
-send = threading.Event()
+# One long-lived command connection per Pico
+pico_pool = DevicePool(pico_addr)
 
 class SwimTimerApp:
-    def __init__(self, root: tk.Tk, swimmers: List[str], max_laps: int = 8):
+    def __init__(self, root: tk.Tk, engine: RaceEngine, refresh_ms: int = REFRESH_MS, board: str = "labels"):
         self.root = root
         self.root.title("Swim Timer")
-        self.root.geometry("1300x650")
+        self.root.geometry("1500x650")
         self.root.config(bg="#ebe8e1")
 
-        self.swimmers = swimmers
-        self.max_laps = max_laps
-
-        # key_map maps '1','2',.. to swimmer names
-        self.key_map: Dict[str, str] = {str(i + 1): name for i, name in enumerate(swimmers)}
-        self.laps: Dict[str, List[float]] = {name: [] for name in swimmers}
-        self.last_lap_elapsed: Dict[str, float] = {name: 0.0 for name in swimmers}
-        self.total_lap_time: Dict[str, float] = {name: 0.0 for name in swimmers}
-
-        # Timer state
-        # self.start_time: Optional[float] = None  # timestamp when current run started, None when stopped
-        # self.elapsed_before_start: float = 0.0   # accumulated elapsed time from previous runs
-        self.running: bool = False
-
-        # --- Timer display ---
-        self.timer_label = tk.Label(
-            root, text="00:00.00", font=("Arial", 60, "bold"),
-            fg="#0f0f0f", bg="#ebe8e1"
-        )
-        self.timer_label.pack(pady=20)
-    
-
-        # --- Table setup ---
-        table = tk.Frame(root, bg="#ebe8e1")
-        table.pack(pady=20)
+        # Race state lives in the engine, this class only draws it
+        self.engine = engine
+        self.swimmers = engine.lanes
+        self.max_laps = engine.max_laps
+        self.refresh_ms = refresh_ms
 
-        headers = ["Swimmer", "Current Lap", "Latest Lap", "Fastest Lap", "Total Time", "Lap #"]
-        widths = [12, 14, 12, 14, 14, 8]
-        for c, (text, w) in enumerate(zip(headers, widths)):
-            tk.Label(table, text=text, font=("Arial", 18, "bold"), fg="#0f0f0f", bg="#ebe8e1", width=w).grid(row=0, column=c)
+        # Only changed label texts reach Tk
+        self.render = LabelRenderer()
 
-        # --- Swimmer rows ---
-        self.row_widgets: Dict[str, Dict[str, tk.Widget]] = {}
-        for i, name in enumerate(swimmers, start=1):
-            row: Dict[str, tk.Widget] = {}
+        # key_map maps '1','2',.. to swimmer names
+        self.key_map: Dict[str, str] = engine.key_map
 
-            row["name_label"] = tk.Label(table, text=name, font=("Arial", 18), fg="#0f0f0f", bg="#ebe8e1")
-            row["name_label"].grid(row=i, column=0, padx=10, pady=8)
+        # --- Scoreboard: grid of labels or a single canvas ---
+        self.board = make_board(board, root, self.swimmers)
+        self.timer_label = self.board.timer_label
+        self.row_widgets = self.board.row_widgets
+        self._timer_job = None
+        # Set by main when Tk callbacks are timed, reported on stop
+        self.watchdog = None
+        # Set by archive_races
+        self.recorder = None
 
-            row["current_lap_label"] = tk.Label(table, text="0.00", font=("Courier", 18), fg="#0f0f0f", bg="#ebe8e1")
-            row["current_lap_label"].grid(row=i, column=1)
+        # t=0 of the next race, fixed when the countdown starts
+        self.starter = StartScheduler(engine)
+        # Start sound, main sets the real one
+        self.signal = NullSignal()
 
-            row["latest_lap_label"] = tk.Label(table, text="-", font=("Courier", 18), fg="#0f0f0f", bg="#ebe8e1")
-            row["latest_lap_label"].grid(row=i, column=2)
+        # Race positions, moved by each touch
+        self.standings = Standings(engine.lanes, engine.max_laps)
+        self.standings.rebuild(engine.store)
 
-            row["best_lap_label"] = tk.Label(table, text="-", font=("Courier", 18), fg="#0f0f0f", bg="#ebe8e1")
-            row["best_lap_label"].grid(row=i, column=3)
+        # Rows touched while a batch of sensor events is applied
+        self._batching = False
+        self._dirty_rows = set()
 
-            row["total_label"] = tk.Label(table, text="0.00", font=("Courier", 18), fg="#0f0f0f", bg="#ebe8e1")
-            row["total_label"].grid(row=i, column=4)
+        engine.subscribe(self.on_race_event)
 
-            row["lap_count_label"] = tk.Label(table, text="0", font=("Arial", 18), fg="#0f0f0f", bg="#ebe8e1")
-            row["lap_count_label"].grid(row=i, column=5)
+        # --- Bind keys ---
+        self.root.bind("<KeyPress>", self.on_key_press)
 
-            
-            tk.Label(table, text="", bg="#ebe8e1", width=4).grid(row=i, column=6, padx=5)
+    @property
+    def timer(self) -> timer.TimerEngine:
+        return self.engine.timer
 
-            self.row_widgets[name] = row
+    @property
+    def store(self) -> lapstore.LapStore:
+        return self.engine.store
 
-        # --- Bind keys ---
-        self.root.bind("<KeyPress>", self.on_key_press)
+    @property
+    def running(self) -> bool:
+        return self.engine.running
 
 
     # --------------------
@@ -108,190 +110,263 @@ class SwimTimerApp:
         if key == "r":          # reset
             self.reset()
             return
+        if key == "p":          # start / stop a profiler capture
+            profiler.toggle()
+            return
 
         # Lap keys (digits) — only while running
         if key in self.key_map and self.running:
             swimmer = self.key_map[key]
-            if len(self.laps.get(swimmer, [])) < self.max_laps:
+            if not self.store.is_finished(swimmer):
                 self.record_lap(swimmer)
 
-    # Start the timer
+    # Start the timer, the engine asks for the countdown through on_race_event
     def start(self):
-        if not self.running:
-            data = {"command": "start", "laps": "8"}
-            try:
-                for addr in pico_addr:
-                    threading.Thread(target=mConn.sendData, args=(addr, data)).start()
-            except Exception as e:
-                print("Error: ",e)
-
-            send.set()
-
-            app.running = True
-            SwimTimerApp.countdown(app, 5)
-
-    # Make a countdown before starting timer and play start sound 
-    def countdown(self, count):
-        if count > 0:
-            self.timer_label.config(text=str(count))
-            # schedule next countdown step after 1 second
-            self.root.after(1000, self.countdown, count - 1)
+        self.engine.arm()
+
+    # Count down to the scheduled start, each step is timed against t=0 so Tk delays do not add up.
+    # The start sound is fired by the scheduler's gun thread, the clock counts from t=0 itself.
+    def countdown(self):
+        if not self.engine.running:
+            return  # reset during the countdown
+        left = self.starter.seconds_left()
+        if left > 0:
+            self.render.set(self.timer_label, str(left))
+            self.root.after(self.starter.next_tick_ms(), self.countdown)
         else:
-            # start_server(handle_message)
-            pygame.mixer.music.play()
-            timer.start_time = time.time()
-            # self.running = True
-            self.update_timer()
+            self.starter.go()
+
+    # t=0 on one Pico's clock, and how far away it is for a Pico that is not synced yet
+    def _start_fields(self, link, deadline: int) -> dict:
+        fields = {"start_in_us": max(0, deadline - self.timer.now_ns()) // 1000}
+        device_us = mConn.clock_sync.device_us(link.name, deadline)
+        if device_us is not None:
+            fields["start_us"] = device_us
+        return fields
 
     # Stop the timer and all lane times
     def stop(self):
-        if self.running and timer.start_time is not None:
-            # Accumulate elapsed time and mark stopped
-            timer.elapsed_before_start += time.time() - timer.start_time
-            timer.start_time = None
-            self.running = False
-
-        data = {"command": "stop"}
-        try:
-            for addr in pico_addr:
-                threading.Thread(target=mConn.sendData, args=(addr, data)).start()
-        except Exception as e:
-            print("Error: ",e)
-
-        send.set()
-
+        if not self.engine.stop():
+            pico_pool.broadcast_async({"command": "stop"})
 
     # Resets all variables, if called while the timer is running it stops and resets the timer
     def reset(self):
-        self.running = False
-        timer.start_time = None
-        timer.elapsed_before_start = 0.0
-        self.timer_label.config(text="00:00.00")
-        for name in self.swimmers:
-            self.laps[name] = []
-            self.last_lap_elapsed[name] = 0.0
-            self.total_lap_time[name] = 0.0
-            row = self.row_widgets[name]
-            row["current_lap_label"].config(text="0.00")
-            row["best_lap_label"].config(text="-")
-            row["latest_lap_label"].config(text="-")
-            row["total_label"].config(text="0.00")
-            row["lap_count_label"].config(text="0")
-
-        data = {"command": "reset"}
-        try:
-            for addr in pico_addr:
-                threading.Thread(target=mConn.sendData, args=(addr, data)).start()
-        except Exception as e:
-            print("Error: ",e)
-
-        send.set()
+        self.engine.reset()
+
+    # Keep the scoreboard in step with the race, called from the thread that changed it
+    def on_race_event(self, event: str, name: Optional[str]):
+        if event == LAP:
+            store = self.store
+            for moved in self.standings.update(name, store.lap_count(name), store.split(name)):
+                if moved != name:
+                    self._render_place(moved)
+            self._refresh_row(name)
+        elif event == ARMED:
+            deadline = self.starter.schedule(COUNTDOWN, gun=self.signal.play, gun_lead_ns=self.signal.lead_ns())
+            pico_pool.broadcast_async({"command": "start", "laps": str(self.max_laps)},
+                                      extra=lambda link: self._start_fields(link, deadline))
+            self.countdown()
+        elif event == RESTORE:
+            self.redraw()
+        elif event == START:
+            self.redraw()
+        elif event == STOP:
+            print(self.render.report())
+            print(self.starter.report())
+            print(self.signal.report())
+            if self.watchdog is not None:
+                print(self.watchdog.report())
+            mConn.clock_sync.print_report()
+            pico_pool.broadcast_async({"command": "stop"})
+        elif event == RESET:
+            self.starter.cancel()
+            self.redraw()
+            pico_pool.broadcast_async({"command": "reset"})
 
     # Update the timer
     def update_timer(self):
         # Always compute current elapsed and show it in the main timer.
         # Per-lane "Total Time" will use the same value/format so they match.
-        elapsed = timer._current_elapsed(self)
-        self.timer_label.config(text=timer._format_timer_display(elapsed))
-
-        # Update per-swimmer timers (both while running and when stopped)
+        # Everything is formatted from whole centiseconds, the renderer
+        # skips labels whose text did not change since the last frame.
+        render = self.render
+        render.begin_frame()
+        store = self.store
+        elapsed_ns = self.timer.elapsed_ns()
+        elapsed_cs = elapsed_ns // timer.NS_PER_CS
+        clock = format_clock(elapsed_cs)
+        render.set(self.timer_label, clock)
+
+        # Update per-swimmer timers (both while running and when stopped),
+        # finished lanes were already drawn by _render_row
         for name in self.swimmers:
-            laps = self.laps[name]
+            if store.is_finished(name):
+                continue
             row = self.row_widgets[name]
-            if len(laps) < self.max_laps:
-                current_lap_time = elapsed - self.last_lap_elapsed[name]
-                row["current_lap_label"].config(text=timer._format_seconds(current_lap_time))
-                # Use same format/value as the main timer so they match visually
-                row["total_label"].config(text=timer._format_timer_display(elapsed))
-            else:
-                row["current_lap_label"].config(text="DONE")
-                row["total_label"].config(text=timer._format_timer_display(self.total_lap_time[name]))
+            current_lap_cs = (elapsed_ns - store.split(name)) // timer.NS_PER_CS
+            render.set(row["current_lap_label"], format_seconds(current_lap_cs))
+            render.set(row["total_label"], clock)
+        render.end_frame()
 
         # Continue updating repeatedly only when running
-        # Update every 0.05s 
         if self.running:
-            self.root.after(50, self.update_timer)
-
-    # Record a lap time for a swimmer
-    def record_lap(self, name: str):
-        if not self.running:
-            return  # ignore lap presses when timer is not running
-
-        # ignore if swimmer already reached max laps
-        if len(self.laps.get(name, [])) >= self.max_laps:
-            return
+            self._timer_job = self.root.after(self.refresh_ms, self.update_timer)
+        else:
+            self._timer_job = None
 
-        elapsed = timer._current_elapsed()
-        lap_time = elapsed - self.last_lap_elapsed[name]
-        self.last_lap_elapsed[name] = elapsed
-        self.laps[name].append(lap_time)
+    # Draw everything again after the state was rebuilt from the journal,
+    # replay writes the store directly so the places are ranked again here
+    def redraw(self):
+        self.standings.rebuild(self.store)
+        for name in self.swimmers:
+            self._render_row(name)
+        if self._timer_job is not None:
+            self.root.after_cancel(self._timer_job)
+        self.update_timer()
+
+    # Apply several events and redraw each touched row once at the end
+    @contextmanager
+    def batch(self):
+        self._batching = True
+        try:
+            yield
+        finally:
+            self._batching = False
+            for name in self._dirty_rows:
+                self._render_row(name)
+            self._dirty_rows.clear()
+
+    def _refresh_row(self, name: str):
+        if self._batching:
+            self._dirty_rows.add(name)
+        else:
+            self._render_row(name)
 
-        self.total_lap_time[name] += lap_time
+    # Update the lap labels of one swimmer
+    def _render_row(self, name: str):
+        store = self.store
+        count = store.lap_count(name)
+        row = self.row_widgets[name]
+        self.render.set(row["lap_count_label"], str(count))
+        if count:
+            self.render.set(row["latest_lap_label"], format_seconds(timer.ns_to_cs(store.last_lap(name))))
+            best, best_idx = store.best_lap(name)  # first occurrence → lap number (1-based)
+            self.render.set(row["best_lap_label"], f"{format_seconds(timer.ns_to_cs(best))} (#{best_idx})")
+            first = max(0, count - SPLITS_SHOWN)
+            self.board.show_splits(name, first + 1,
+                                   [format_seconds(timer.ns_to_cs(t)) for t in store.lap_times(name, first)])
+        else:
+            self.render.set(row["latest_lap_label"], "-")
+            self.render.set(row["best_lap_label"], "-")
+            self.board.show_splits(name, 1, [])
 
+        # Stop swimmer after reaching max laps
+        if count >= self.max_laps:
+            self.render.set(row["current_lap_label"], "DONE")
+            self.render.set(row["total_label"], format_clock(store.total_time(name) // timer.NS_PER_CS))
+        self._render_place(name)
 
-        # Update labels
+    # Place and projected finish of one swimmer, blank until the first lap
+    def _render_place(self, name: str):
         row = self.row_widgets[name]
-        row["lap_count_label"].config(text=str(len(self.laps[name])))
-        row["latest_lap_label"].config(text=timer._format_seconds(lap_time))
-        best = min(self.laps[name]) if self.laps[name] else None
-        if best is not None:
-            best_idx = self.laps[name].index(best) + 1  # first occurrence → lap number (1-based)
-            row["best_lap_label"].config(text=f"{timer._format_seconds(best)} (#{best_idx})")
+        projection = self.standings.projection(name)
+        if projection is None:
+            self.render.set(row["place_label"], "-")
+            self.render.set(row["projection_label"], "-")
         else:
-            row["best_lap_label"].config(text="-")
+            self.render.set(row["place_label"], str(self.standings.place(name)))
+            self.render.set(row["projection_label"], format_clock(projection // timer.NS_PER_CS))
 
-        # Stop swimmer after reaching max laps
-        if len(self.laps[name]) >= self.max_laps:
-            
-            row["current_lap_label"].config(text="DONE")
+    # Record a lap time for a swimmer
+    def record_lap(self, name: str):
+        self.engine.split(name)
 
-        # If every swimmer has finished, stop main timer
-        if all(len(self.laps[s]) >= self.max_laps for s in self.swimmers):
-            self.stop()
-    
     # Record a lap from an external time input
     def set_lap(self, lap: str,  name: str):
-        # time = float(lap)
-        if not self.running:
-            return  # ignore lap presses when timer is not running
+        self.engine.lap(name, lap)
 
-        # ignore if swimmer already reached max laps
-        if len(self.laps.get(name, [])) >= self.max_laps:
-            return
-        elapsed = float(lap)
-        lap_time = float(lap) - self.total_lap_time[name]
-        self.last_lap_elapsed[name] = elapsed
-        self.laps[name].append(lap_time)
+    # Stream every race into the results archive, SQLite runs on the writer's thread
+    def archive_races(self, writer: ArchiveWriter, meet: str = "", event: str = "", heat: int = 0) -> RaceRecorder:
+        self.recorder = RaceRecorder(self.engine, writer, meet, event, heat)
+        return self.recorder
 
-        self.total_lap_time[name] += lap_time
 
-        # Update labels
-        row = self.row_widgets[name]
-        row["lap_count_label"].config(text=str(len(self.laps[name])))
-        row["latest_lap_label"].config(text=timer._format_seconds(lap_time))
-        best = min(self.laps[name]) if self.laps[name] else None
-        if best is not None:
-            best_idx = self.laps[name].index(best) + 1  # first occurrence → lap number (1-based)
-            row["best_lap_label"].config(text=f"{timer._format_seconds(best)} (#{best_idx})")
-        else:
-            row["best_lap_label"].config(text="-")
 
-        # Stop swimmer after reaching max laps
-        if len(self.laps[name]) >= self.max_laps:
-            
-            row["current_lap_label"].config(text="DONE")
-
-        # If every swimmer has finished, stop main timer
-        if all(len(self.laps[s]) >= self.max_laps for s in self.swimmers):
-            self.stop()
 
 
+# The spectator site of test.py on this engine, its controls go through submit.
+# Imported on demand, Flask alone costs more than the rest of startup.
+def serve_web(engine, submit):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    import test
+    return test.serve(engine, submit)
 
 
 if __name__ == "__main__":
     swimmers = [f"Lane {i}" for i in range(1, 5)] # change to ID swimmers
-    root = tk.Tk()
-    app = SwimTimerApp(root, swimmers, max_laps=8)
+    startup.mark("imports")
+    with startup.phase("Tk"):
+        root = tk.Tk()
+    board = "canvas" if "--canvas" in sys.argv else "labels"
+    with startup.phase("scoreboard"):
+        engine = RaceEngine(swimmers, max_laps=8)
+        app = SwimTimerApp(root, engine, board=board)
+
+    if "--replay" in sys.argv:
+        # Re-run a recorded race, --speed 2 for double speed or --speed max
+        path = sys.argv[sys.argv.index("--replay") + 1]
+        speed = sys.argv[sys.argv.index("--speed") + 1] if "--speed" in sys.argv else "1"
+        journal.replay_into(app, journal.read(path), None if speed == "max" else float(speed))
+        root.mainloop()
+        sys.exit()
+
+    # Laps go to the archive as they are swum, --meet, --event and --heat label the races
+    meet = sys.argv[sys.argv.index("--meet") + 1] if "--meet" in sys.argv else ""
+    event = sys.argv[sys.argv.index("--event") + 1] if "--event" in sys.argv else ""
+    heat = int(sys.argv[sys.argv.index("--heat") + 1]) if "--heat" in sys.argv else 0
+    with startup.phase("archive"):
+        app.archive_races(ArchiveWriter(), meet, event, heat)
+
+    # Start sound loads in the background from the first frame on, --no-audio for machines without a sound device
+    app.signal = LazySignal("null" if "--no-audio" in sys.argv else "pygame")
+
+    # Rebuild the race if the last run died, then keep appending to the journal
+    with startup.phase("journal"):
+        if os.path.exists(journal.JOURNAL_PATH):
+            engine.restore(journal.read(journal.JOURNAL_PATH))
+        engine.journal = journal.Journal(journal.JOURNAL_PATH)
+
+    # Socket threads only queue messages, the Tk loop applies them
+    events = EventQueue(app, lambda msg: mConn.handle_message(msg, engine))
+    events.start()
+    # Time every Tk callback and log whatever blocks the loop
+    app.watchdog = LagWatchdog(root).install()
+
+    # Sound, sensors, Picos and metrics come up once the board is on screen, started from
+    # a thread so their imports do not hold up the Tk loop, --startup-report prints where the time to the first frame went
+    def start_services():
+        app.signal.warm()
+        with startup.phase("sensor server"):
+            mConn.start_server(lambda msg, app: events.put(msg), app)
+        if "--udp" in sys.argv:
+            with startup.phase("UDP listener"):
+                try:
+                    mConn.start_udp_server(lambda msg, app: events.put(msg), app)
+                except OSError as e:
+                    print("Error: ", e)
+        with startup.phase("Pico links"):
+            pico_pool.connect_all()
+            mConn.clock_sync.start(pico_pool)
+        if "--web" in sys.argv:
+            with startup.phase("web page"):
+                serve_web(engine, events.put)
+        with startup.phase("metrics endpoint"):
+            try:
+                serve_metrics(routes=profile_routes())
+            except OSError as e:
+                print("Error: ", e)
+        if "--startup-report" in sys.argv:
+            print(startup.report())
 
-    mConn.start_server(mConn.handle_message, app)
+    startup.first_frame(root, then=threading.Thread(target=start_services, daemon=True).start)
     root.mainloop()
\ No newline at end of file
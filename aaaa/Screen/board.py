@@ -0,0 +1,128 @@
+import tkinter as tk
+from typing import Dict, List
+
+BG = "#ebe8e1"
+FG = "#0f0f0f"
+HEADERS = ["Swimmer", "Place", "Current Lap", "Latest Lap", "Fastest Lap", "Total Time", "Projected", "Lap #"]
+WIDTHS = [12, 6, 14, 12, 14, 14, 12, 8]
+FIELDS = ["name_label", "place_label", "current_lap_label", "latest_lap_label", "best_lap_label", "total_label",
+          "projection_label", "lap_count_label"]
+INITIAL = {"place_label": "-", "current_lap_label": "0.00", "latest_lap_label": "-", "best_lap_label": "-",
+           "total_label": "0.00", "projection_label": "-", "lap_count_label": "0"}
+# Cells in a fixed-width font so times do not jitter as digits change
+MONO = ("current_lap_label", "latest_lap_label", "best_lap_label", "total_label", "projection_label")
+
+SPLITS_SHOWN = 6  # splits visible per lane in the canvas history column
+
+
+# Both boards expose the same thing to SwimTimerApp:
+#   timer_label              the big clock
+#   row_widgets[name][field] one object per cell with .config(text=...)
+#   show_splits(...)         lap history, only drawn by the canvas board
+
+# The original table, one tk.Label per cell in a grid
+class LabelBoard:
+    def __init__(self, root: tk.Tk, swimmers: List[str]):
+        # --- Timer display ---
+        self.timer_label = tk.Label(
+            root, text="00:00.00", font=("Arial", 60, "bold"),
+            fg=FG, bg=BG
+        )
+        self.timer_label.pack(pady=20)
+
+        # --- Table setup ---
+        table = tk.Frame(root, bg=BG)
+        table.pack(pady=20)
+
+        for c, (text, w) in enumerate(zip(HEADERS, WIDTHS)):
+            tk.Label(table, text=text, font=("Arial", 18, "bold"), fg=FG, bg=BG, width=w).grid(row=0, column=c)
+
+        # --- Swimmer rows ---
+        self.row_widgets: Dict[str, Dict[str, tk.Widget]] = {}
+        for i, name in enumerate(swimmers, start=1):
+            row: Dict[str, tk.Widget] = {}
+
+            row["name_label"] = tk.Label(table, text=name, font=("Arial", 18), fg=FG, bg=BG)
+            row["name_label"].grid(row=i, column=0, padx=10, pady=8)
+
+            for c, field in enumerate(FIELDS[1:], start=1):
+                font = ("Courier", 18) if field in MONO else ("Arial", 18)
+                row[field] = tk.Label(table, text=INITIAL[field], font=font, fg=FG, bg=BG)
+                row[field].grid(row=i, column=c)
+
+            tk.Label(table, text="", bg=BG, width=4).grid(row=i, column=len(FIELDS), padx=5)
+
+            self.row_widgets[name] = row
+
+    def show_splits(self, name: str, first_lap: int, texts: List[str]):
+        pass
+
+
+# One canvas text item, looks like a Label to the renderer
+class CanvasText:
+    __slots__ = ("canvas", "item")
+
+    def __init__(self, canvas: tk.Canvas, item: int):
+        self.canvas = canvas
+        self.item = item
+
+    def config(self, text: str):
+        self.canvas.itemconfigure(self.item, text=text)
+
+
+# Whole board drawn on a single tk.Canvas, cells are text items updated by id.
+# No widget per cell and no grid layout, so 10 lanes with split history stay cheap.
+class CanvasBoard:
+    def __init__(self, root: tk.Tk, swimmers: List[str], width: int = 1500, height: int = 650):
+        self.canvas = tk.Canvas(root, width=width, height=height, bg=BG, highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        canvas = self.canvas
+
+        self.timer_label = CanvasText(canvas, canvas.create_text(
+            width // 2, 60, text="00:00.00", font=("Arial", 60, "bold"), fill=FG
+        ))
+
+        # Column x positions, the split history takes what is left on the right
+        char = 11  # rough pixel width of one character at size 18
+        xs, x = [], 20
+        for w in WIDTHS:
+            xs.append(x + w * char // 2)
+            x += w * char
+        splits_x = x + 10
+
+        header_y = 140
+        row_h = max(28, min(50, (height - header_y - 20) // max(1, len(swimmers))))
+        for text, cx in zip(HEADERS, xs):
+            canvas.create_text(cx, header_y, text=text, font=("Arial", 18, "bold"), fill=FG)
+        canvas.create_text(splits_x, header_y, text="Splits", font=("Arial", 18, "bold"), fill=FG, anchor="w")
+
+        self.row_widgets: Dict[str, Dict[str, CanvasText]] = {}
+        self.split_items: Dict[str, CanvasText] = {}
+        for i, name in enumerate(swimmers, start=1):
+            y = header_y + i * row_h
+            row: Dict[str, CanvasText] = {}
+            for field, cx in zip(FIELDS, xs):
+                text = name if field == "name_label" else INITIAL[field]
+                font = ("Courier", 18) if field in MONO else ("Arial", 18)
+                row[field] = CanvasText(canvas, canvas.create_text(cx, y, text=text, font=font, fill=FG))
+            self.row_widgets[name] = row
+            self.split_items[name] = CanvasText(canvas, canvas.create_text(
+                splits_x, y, text="", font=("Courier", 14), fill=FG, anchor="w"
+            ))
+
+    # Show the latest splits of a lane, older ones scroll off to the left
+    def show_splits(self, name: str, first_lap: int, texts: List[str]):
+        shown = texts[-SPLITS_SHOWN:]
+        first = first_lap + len(texts) - len(shown)
+        self.split_items[name].config(
+            text="  ".join(f"{n}:{t.strip()}" for n, t in enumerate(shown, start=first))
+        )
+
+
+BOARDS = {"labels": LabelBoard, "canvas": CanvasBoard}
+
+
+def make_board(kind: str, root: tk.Tk, swimmers: List[str]):
+    if kind not in BOARDS:
+        raise ValueError(f"Unknown board {kind!r}, choose from {', '.join(BOARDS)}")
+    return BOARDS[kind](root, swimmers)
@@ -0,0 +1,47 @@
+from collections import deque
+
+from Monitor.metrics import metrics
+
+DRAIN_INTERVAL = 10  # ms between queue drains on the Tk loop
+
+
+# Hands sensor messages from the socket threads to the Tk main loop.
+# put() can be called from any thread, every tick the Tk loop applies all
+# pending messages in arrival order inside app.batch(), so a burst of
+# touches across lanes ends in one redraw per touched row.
+class EventQueue:
+    def __init__(self, app, handler, interval: int = DRAIN_INTERVAL):
+        self.app = app
+        self.handler = handler
+        self.interval = interval
+        self.events = deque()  # append/popleft are thread-safe
+        self.dispatched = 0
+        self.batches = 0
+
+    def put(self, msg):
+        self.events.append(msg)
+
+    def __len__(self):
+        return len(self.events)
+
+    def start(self):
+        metrics.gauges["queue_depth"] = self.__len__
+        self.app.root.after(self.interval, self.drain)
+
+    def drain(self):
+        events = self.events
+        # Only take what is queued now, later arrivals wait for the next tick
+        pending = len(events)
+        if pending:
+            batch = [events.popleft() for _ in range(pending)]
+            with self.app.batch():
+                for msg in batch:
+                    metrics.dispatched(msg)
+                    try:
+                        self.handler(msg)
+                    except Exception as e:
+                        print("Error: ", e)
+            metrics.updated(batch)
+            self.dispatched += pending
+            self.batches += 1
+        self.app.root.after(self.interval, self.drain)
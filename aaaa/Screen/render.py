@@ -0,0 +1,68 @@
+from functools import lru_cache
+
+REFRESH_MS = 50  # default update_timer interval, 10 is fine with the renderer
+
+
+# --------------------
+# Formatting from integer centiseconds
+# --------------------
+@lru_cache(maxsize=8192)
+def format_clock(cs: int) -> str:
+    """mm:ss.hh, same text as _format_timer_display."""
+    mins, rest = divmod(cs, 6000)
+    secs, hundredths = divmod(rest, 100)
+    return f"{mins:02d}:{secs:02d}.{hundredths:02d}"
+
+
+@lru_cache(maxsize=8192)
+def format_seconds(cs: int) -> str:
+    """ss.hh padded to 5 characters, same text as _format_seconds."""
+    return f"{cs / 100:5.2f}"
+
+
+def to_cs(seconds: float) -> int:
+    return int(seconds * 100)
+
+
+# Remembers the text last sent to every widget and only calls Tk when it changes.
+# All text updates of a widget must go through set() or the cache goes stale.
+class LabelRenderer:
+    def __init__(self):
+        self.last = {}
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self.updates = 0
+        self.updates_skipped = 0
+        self._frame_updates = 0
+
+    def set(self, widget, text: str):
+        if self.last.get(widget) == text:
+            self.updates_skipped += 1
+            return
+        self.last[widget] = text
+        widget.config(text=text)
+        self.updates += 1
+        self._frame_updates += 1
+
+    # A frame is one update_timer pass, it is skipped if no widget changed
+    def begin_frame(self):
+        self._frame_updates = 0
+
+    def end_frame(self):
+        if self._frame_updates:
+            self.frames_rendered += 1
+        else:
+            self.frames_skipped += 1
+
+    def stats(self) -> dict:
+        return {
+            "frames_rendered": self.frames_rendered,
+            "frames_skipped": self.frames_skipped,
+            "updates": self.updates,
+            "updates_skipped": self.updates_skipped,
+        }
+
+    def report(self) -> str:
+        total = self.frames_rendered + self.frames_skipped
+        return (f"Frames rendered {self.frames_rendered}/{total}, "
+                f"label updates {self.updates}, skipped {self.updates_skipped}")
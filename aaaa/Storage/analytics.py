@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from Storage.archive import ARCHIVE_PATH, connect
+
+CHUNK = 1 << 20          # laps read per pass, bounds memory whatever the season size
+MAX_LAPS = 64            # laps per swim the pacing curve keeps apart, later laps share the last column
+BIN_NS = 100_000_000     # lap time histogram resolution, 0.1 s
+MAX_BIN = 1800           # laps over 3 minutes land in the last bin
+COLUMNS = {"race_id": np.int64, "lane": np.int16, "group": np.int32, "lap_index": np.int16, "ticks": np.int64}
+
+# Laps of finished swims only, in primary key order so every swim is a run of rows
+LAPS_SQL = """
+SELECT l.race_id, l.lane, g.id, l.lap_index, l.ticks
+FROM laps l
+JOIN results r ON r.race_id = l.race_id AND r.lane = l.lane
+JOIN temp.groups g ON g.swimmer = r.swimmer AND g.event = r.event
+ORDER BY l.race_id, l.lane, l.lap_index
+"""
+
+
+# --------------------
+# Loading, columns of a few arrays instead of rows of tuples
+# --------------------
+def groups(db: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """(swimmer, event) pairs with a result, the position in the list is the group number."""
+    pairs = db.execute("SELECT DISTINCT swimmer, event FROM results ORDER BY swimmer, event").fetchall()
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS groups (id INTEGER PRIMARY KEY, swimmer TEXT, event TEXT)")
+    db.execute("DELETE FROM temp.groups")
+    db.executemany("INSERT INTO temp.groups VALUES (?, ?, ?)", [(i, s, e) for i, (s, e) in enumerate(pairs)])
+    return pairs
+
+
+def read_chunks(db: sqlite3.Connection, chunk: int = CHUNK) -> Iterator[Dict[str, np.ndarray]]:
+    """Columns of the archived laps, chunk rows at a time, groups() must have run on db."""
+    cursor = db.execute(LAPS_SQL)
+    while True:
+        rows = cursor.fetchmany(chunk)
+        if not rows:
+            return
+        table = np.array(rows, dtype=np.int64)
+        yield {name: table[:, i].astype(dtype) for i, (name, dtype) in enumerate(COLUMNS.items())}
+
+
+def export(path: str, directory: str, chunk: int = CHUNK) -> int:
+    """Write the archive as one .npy file per column for load_chunks, returns the lap count."""
+    db = connect(path)
+    names = groups(db)
+    total = db.execute("SELECT COUNT(*) FROM laps l JOIN results r "
+                       "ON r.race_id = l.race_id AND r.lane = l.lane").fetchone()[0]
+    os.makedirs(directory, exist_ok=True)
+    out = {name: np.lib.format.open_memmap(os.path.join(directory, name + ".npy"), mode="w+",
+                                           dtype=dtype, shape=(total,))
+           for name, dtype in COLUMNS.items()}
+    n = 0
+    for cols in read_chunks(db, chunk):
+        size = len(cols["ticks"])
+        for name, column in cols.items():
+            out[name][n:n + size] = column
+        n += size
+    for column in out.values():
+        column.flush()
+    with open(os.path.join(directory, "groups.json"), "w") as f:
+        json.dump(names, f)
+    return n
+
+
+def load_chunks(directory: str, chunk: int = CHUNK) -> Tuple[List[Tuple[str, str]], Iterator[Dict[str, np.ndarray]]]:
+    """Groups and column chunks of an export, the files are memory-mapped and paged in per chunk."""
+    with open(os.path.join(directory, "groups.json")) as f:
+        names = [tuple(pair) for pair in json.load(f)]
+    columns = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in COLUMNS}
+
+    def chunks():
+        for start in range(0, len(columns["ticks"]), chunk):
+            yield {name: np.asarray(column[start:start + chunk]) for name, column in columns.items()}
+    return names, chunks()
+
+
+def swims(chunks: Iterator[Dict[str, np.ndarray]]) -> Iterator[Dict[str, np.ndarray]]:
+    """Re-cut chunks so no swim is split between two of them."""
+    carry = None
+    for cols in chunks:
+        if carry is not None:
+            cols = {name: np.concatenate((carry[name], cols[name])) for name in cols}
+        new = _swim_starts(cols)
+        last = new[-1]
+        carry = {name: column[last:] for name, column in cols.items()}
+        if last:
+            yield {name: column[:last] for name, column in cols.items()}
+    if carry is not None and len(carry["ticks"]):
+        yield carry
+
+
+def _swim_starts(cols: Dict[str, np.ndarray]) -> np.ndarray:
+    race, lane = cols["race_id"], cols["lane"]
+    changed = (race[1:] != race[:-1]) | (lane[1:] != lane[:-1])
+    return np.concatenate(([0], np.flatnonzero(changed) + 1))
+
+
+# --------------------
+# Season statistics, sums per group so chunks can be added one after the other
+# --------------------
+class SeasonStats:
+    def __init__(self, n_groups: int):
+        self.n = n_groups
+        self.swims = np.zeros(n_groups, np.int64)
+        self.best = np.full(n_groups, np.iinfo(np.int64).max, np.int64)
+        self.fatigue_sum = np.zeros(n_groups)
+        self.fatigue_n = np.zeros(n_groups, np.int64)
+        self.cv_sum = np.zeros(n_groups)
+        self.share_sum = np.zeros((n_groups, MAX_LAPS))
+        self.share_n = np.zeros((n_groups, MAX_LAPS), np.int64)
+        self.hist = np.zeros((n_groups, MAX_BIN + 1), np.int64)
+        self.laps = 0
+
+    def add(self, cols: Dict[str, np.ndarray]):
+        """Fold in a chunk of whole swims."""
+        ticks = cols["ticks"].astype(np.float64)
+        starts = _swim_starts(cols)
+        n = np.diff(np.append(starts, len(ticks)))
+        group = cols["group"][starts]
+        self.laps += len(ticks)
+
+        # Per swim: total, mean and spread of the laps
+        total = np.add.reduceat(ticks, starts)
+        mean = total / n
+        var = np.add.reduceat(ticks * ticks, starts) / n - mean * mean
+        cv = np.sqrt(np.maximum(var, 0.0)) / mean
+
+        # Fatigue index: second half of the laps against the first half, in percent
+        pos = np.arange(len(ticks)) - np.repeat(starts, n)
+        half = np.repeat(n // 2, n)
+        first = np.add.reduceat(np.where(pos < half, ticks, 0.0), starts)
+        second = np.add.reduceat(np.where(pos >= np.repeat(n, n) - half, ticks, 0.0), starts)
+        split = n >= 2
+        fatigue = np.divide(second, first, out=np.ones_like(first), where=first > 0) * 100.0 - 100.0
+
+        self.swims += np.bincount(group, minlength=self.n)
+        np.minimum.at(self.best, group, total.astype(np.int64))
+        self.cv_sum += np.bincount(group, weights=cv, minlength=self.n)
+        self.fatigue_sum += np.bincount(group[split], weights=fatigue[split], minlength=self.n)
+        self.fatigue_n += np.bincount(group[split], minlength=self.n)
+
+        # Pacing: every lap's share of its swim, summed per group and lap number
+        row_group = np.repeat(group, n)
+        cell = row_group.astype(np.int64) * MAX_LAPS + np.minimum(pos, MAX_LAPS - 1)
+        share = ticks / np.repeat(total, n)
+        size = self.n * MAX_LAPS
+        self.share_sum += np.bincount(cell, weights=share, minlength=size).reshape(self.n, MAX_LAPS)
+        self.share_n += np.bincount(cell, minlength=size).reshape(self.n, MAX_LAPS)
+
+        # Lap time distribution
+        bins = np.minimum(cols["ticks"] // BIN_NS, MAX_BIN)
+        self.hist += np.bincount(row_group.astype(np.int64) * (MAX_BIN + 1) + bins,
+                                 minlength=self.n * (MAX_BIN + 1)).reshape(self.n, MAX_BIN + 1)
+
+    # --------------------
+    # Reads, one value (or row) per group
+    # --------------------
+    def fatigue(self) -> np.ndarray:
+        return np.divide(self.fatigue_sum, self.fatigue_n, out=np.full(self.n, np.nan), where=self.fatigue_n > 0)
+
+    def split_cv(self) -> np.ndarray:
+        return np.divide(self.cv_sum, self.swims, out=np.full(self.n, np.nan), where=self.swims > 0)
+
+    def pacing(self) -> np.ndarray:
+        """Mean share of the race time per lap number, in percent."""
+        return np.divide(self.share_sum, self.share_n, out=np.full(self.share_sum.shape, np.nan),
+                         where=self.share_n > 0) * 100.0
+
+    def percentiles(self, qs=(0.1, 0.5, 0.9)) -> np.ndarray:
+        """Lap time in seconds at each quantile, the upper edge of its 0.1 s bin."""
+        cum = np.cumsum(self.hist, axis=1)
+        count = cum[:, -1:]
+        out = np.full((self.n, len(qs)), np.nan)
+        for j, q in enumerate(qs):
+            idx = (cum < np.maximum(1, np.ceil(q * count))).sum(axis=1)
+            out[:, j] = np.where(count[:, 0] > 0, (idx + 1) * BIN_NS / 1e9, np.nan)
+        return out
+
+
+def season(chunks: Iterator[Dict[str, np.ndarray]], n_groups: int) -> SeasonStats:
+    stats = SeasonStats(n_groups)
+    for cols in swims(chunks):
+        stats.add(cols)
+    return stats
+
+
+def report(stats: SeasonStats, names: List[Tuple[str, str]], swimmer: Optional[str] = None,
+           event: Optional[str] = None) -> str:
+    fatigue, cv, pacing, pct = stats.fatigue(), stats.split_cv(), stats.pacing(), stats.percentiles()
+    lines = [f"{'Swimmer':<16}{'Event':<12}{'Swims':>6}{'Best':>9}{'Fatigue':>9}{'CV':>7}"
+             f"{'p10':>7}{'p50':>7}{'p90':>7}  Pacing % per lap"]
+    for g, (name, ev) in enumerate(names):
+        if (swimmer and name != swimmer) or (event and ev != event) or not stats.swims[g]:
+            continue
+        curve = " ".join(f"{share:.1f}" for share in pacing[g][~np.isnan(pacing[g])])
+        lines.append(f"{name:<16}{ev:<12}{stats.swims[g]:>6}{stats.best[g] / 1e9:>9.2f}{fatigue[g]:>8.1f}%"
+                     f"{cv[g] * 100:>6.1f}%{pct[g, 0]:>7.1f}{pct[g, 1]:>7.1f}{pct[g, 2]:>7.1f}  {curve}")
+    return "\n".join(lines)
+
+
+# python -m Storage.analytics results.db [--swimmer NAME] [--event EVENT] [--export DIR | --npy DIR]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Season report from the results archive")
+    parser.add_argument("archive", nargs="?", default=ARCHIVE_PATH)
+    parser.add_argument("--swimmer")
+    parser.add_argument("--event")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="laps per pass")
+    parser.add_argument("--export", metavar="DIR", help="write the laps as .npy columns and exit")
+    parser.add_argument("--npy", metavar="DIR", help="read memory-mapped columns from an export")
+    args = parser.parse_args(argv)
+
+    t = time.perf_counter()
+    if args.export:
+        n = export(args.archive, args.export, args.chunk)
+        print(f"{n} laps to {args.export} in {time.perf_counter() - t:.2f} s")
+        return
+    if args.npy:
+        names, chunks = load_chunks(args.npy, args.chunk)
+    else:
+        db = connect(args.archive)
+        names = groups(db)
+        chunks = read_chunks(db, args.chunk)
+    stats = season(chunks, len(names))
+    print(report(stats, names, args.swimmer, args.event))
+    print(f"{stats.laps} laps in {time.perf_counter() - t:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
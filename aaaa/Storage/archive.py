@@ -0,0 +1,247 @@
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from Timer.engine import RaceEngine, START, STOP, RESET, RESTORE, LAP
+
+ARCHIVE_PATH = "results.db"
+
+# Every lap of every race, plus one result row per finished lane so the
+# personal best and progression queries are a single index range scan.
+# Times are TimerEngine nanoseconds like everywhere else.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS races (
+    id          INTEGER PRIMARY KEY,
+    meet        TEXT NOT NULL,
+    event       TEXT NOT NULL,
+    heat        INTEGER NOT NULL,
+    started_at  REAL NOT NULL,
+    laps        INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS laps (
+    race_id     INTEGER NOT NULL,
+    lane        INTEGER NOT NULL,
+    swimmer     TEXT NOT NULL,
+    lap_index   INTEGER NOT NULL,
+    ticks       INTEGER NOT NULL,
+    PRIMARY KEY (race_id, lane, lap_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (
+    race_id     INTEGER NOT NULL,
+    lane        INTEGER NOT NULL,
+    swimmer     TEXT NOT NULL,
+    event       TEXT NOT NULL,
+    started_at  REAL NOT NULL,
+    ticks       INTEGER NOT NULL,
+    PRIMARY KEY (race_id, lane)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_best ON results (swimmer, event, ticks);
+CREATE INDEX IF NOT EXISTS results_history ON results (swimmer, event, started_at);
+CREATE INDEX IF NOT EXISTS races_heat ON races (meet, event, heat);
+"""
+
+# Result rows for the lanes of a race that swam every lap
+FINISH_SQL = """
+INSERT OR REPLACE INTO results (race_id, lane, swimmer, event, started_at, ticks)
+SELECT l.race_id, l.lane, l.swimmer, r.event, r.started_at, SUM(l.ticks)
+FROM laps l JOIN races r ON r.id = l.race_id
+WHERE l.race_id = ?
+GROUP BY l.lane
+HAVING COUNT(*) = MAX(r.laps)
+"""
+
+
+def connect(path: str = ARCHIVE_PATH) -> sqlite3.Connection:
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")    # readers never wait for the writer
+    db.execute("PRAGMA synchronous=NORMAL")  # fsync at checkpoints, the race journal covers crashes
+    db.executescript(SCHEMA)
+    return db
+
+
+# Owns the only write connection and applies queued writes on its own thread.
+# Callers never touch SQLite: every method only puts a tuple on the queue, the
+# thread takes whatever is waiting and writes it in one transaction with
+# executemany, so a burst of touches is one commit.
+class ArchiveWriter:
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self.queue: "queue.Queue[tuple]" = queue.Queue()
+        self.written = 0
+        self.commits = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --------------------
+    # Non-blocking API
+    # --------------------
+    def start_race(self, race_id: int, meet: str, event: str, heat: int, started_at: float, laps: int):
+        self.queue.put(("race", (race_id, meet, event, heat, started_at, laps)))
+
+    def add_lap(self, race_id: int, lane: int, swimmer: str, lap_index: int, ticks: int):
+        self.queue.put(("lap", (race_id, lane, swimmer, lap_index, ticks)))
+
+    def add_laps(self, rows: List[tuple]):
+        """Bulk (race_id, lane, swimmer, lap_index, ticks) rows, e.g. a whole race at its end."""
+        for row in rows:
+            self.queue.put(("lap", row))
+
+    def finish_race(self, race_id: int):
+        self.queue.put(("finish", (race_id,)))
+
+    def flush(self):
+        """Block until everything queued so far is committed, not for the Tk thread."""
+        self.queue.join()
+
+    # --------------------
+    # Writer thread
+    # --------------------
+    def _run(self):
+        db = connect(self.path)
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(db, batch)
+            except sqlite3.Error as e:
+                print("Error: ", e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, db: sqlite3.Connection, batch: List[tuple]):
+        races = [row for kind, row in batch if kind == "race"]
+        laps = [row for kind, row in batch if kind == "lap"]
+        finished = [row for kind, row in batch if kind == "finish"]
+        with db:
+            if races:
+                db.executemany("INSERT OR REPLACE INTO races VALUES (?, ?, ?, ?, ?, ?)", races)
+            if laps:
+                db.executemany("INSERT OR REPLACE INTO laps VALUES (?, ?, ?, ?, ?)", laps)
+            for row in finished:
+                db.execute(FINISH_SQL, row)
+        self.written += len(batch)
+        self.commits += 1
+
+
+# Engine subscriber that streams a race into an ArchiveWriter as it is swum.
+# A race opens when the clock starts from zero and closes when every lane has
+# finished or the board is reset, lanes that did not swim every lap get no result.
+class RaceRecorder:
+    def __init__(self, engine: RaceEngine, writer: ArchiveWriter, meet: str = "", event: str = "", heat: int = 0):
+        self.engine = engine
+        self.writer = writer
+        self.meet = meet
+        self.event = event
+        self.heat = heat
+        self.race_id: Optional[int] = None
+        engine.subscribe(self.on_race_event)
+
+    def on_race_event(self, event: str, name: Optional[str]):
+        engine = self.engine
+        if event == LAP:
+            if self.race_id is None:
+                self._open()
+            store = engine.store
+            self.writer.add_lap(self.race_id, engine.lane_no[name], name, store.lap_count(name), store.last_lap(name))
+        elif event == START:
+            if self.race_id is None:
+                self._open()
+        elif event == STOP:
+            if engine.store.all_finished:
+                self._close()
+        elif event == RESET:
+            self._close()
+        elif event == RESTORE:
+            # The journal rebuilt a race we lost track of, archive it as a new one
+            self._close()
+            if engine.running:
+                self._open()
+                self.writer.add_laps([
+                    (self.race_id, engine.lane_no[lane], lane, i + 1, ticks)
+                    for lane in engine.lanes for i, ticks in enumerate(engine.store.lap_times(lane))
+                ])
+
+    def _open(self):
+        self.race_id = time.time_ns()
+        self.writer.start_race(self.race_id, self.meet, self.event, self.heat, time.time(), self.engine.max_laps)
+
+    def _close(self):
+        if self.race_id is not None:
+            self.writer.finish_race(self.race_id)
+            self.race_id = None
+
+
+# --------------------
+# Queries, each one index range scan
+# --------------------
+class Archive:
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.db = connect(path)
+
+    def personal_best(self, swimmer: str, event: str) -> Optional[dict]:
+        row = self.db.execute(
+            "SELECT race_id, lane, ticks, started_at FROM results "
+            "WHERE swimmer = ? AND event = ? ORDER BY ticks LIMIT 1", (swimmer, event)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"race_id": row[0], "lane": row[1], "ticks": row[2], "started_at": row[3]}
+
+    def personal_bests(self, swimmer: str) -> Dict[str, int]:
+        """Best time per event."""
+        return dict(self.db.execute(
+            "SELECT event, MIN(ticks) FROM results WHERE swimmer = ? GROUP BY event", (swimmer,)
+        ))
+
+    def progression(self, swimmer: str, event: str, since: float = 0.0,
+                    until: float = float("inf")) -> List[Tuple[float, int, int]]:
+        """(started_at, ticks, race_id) of every finished race in the period, oldest first."""
+        return self.db.execute(
+            "SELECT started_at, ticks, race_id FROM results "
+            "WHERE swimmer = ? AND event = ? AND started_at BETWEEN ? AND ? ORDER BY started_at",
+            (swimmer, event, since, until if until != float("inf") else 1e300)
+        ).fetchall()
+
+    def splits(self, race_id: int, lane: int) -> List[int]:
+        return [ticks for (ticks,) in self.db.execute(
+            "SELECT ticks FROM laps WHERE race_id = ? AND lane = ? ORDER BY lap_index", (race_id, lane)
+        )]
+
+    def compare_splits(self, a: Tuple[int, int], b: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+        """Per lap of two (race_id, lane) swims: (lap, ticks a, ticks b, running difference a - b)."""
+        rows, gap = [], 0
+        for i, (ta, tb) in enumerate(zip(self.splits(*a), self.splits(*b)), start=1):
+            gap += ta - tb
+            rows.append((i, ta, tb, gap))
+        return rows
+
+    def races(self, meet: str, event: Optional[str] = None) -> List[tuple]:
+        if event is None:
+            return self.db.execute("SELECT * FROM races WHERE meet = ? ORDER BY event, heat", (meet,)).fetchall()
+        return self.db.execute("SELECT * FROM races WHERE meet = ? AND event = ? ORDER BY heat",
+                               (meet, event)).fetchall()
+
+
+# python -m Storage.archive results.db swimmer [event]
+if __name__ == "__main__":
+    archive = Archive(sys.argv[1] if len(sys.argv) > 1 else ARCHIVE_PATH)
+    swimmer = sys.argv[2] if len(sys.argv) > 2 else "Lane 1"
+    t = time.perf_counter()
+    if len(sys.argv) > 3:
+        best = archive.personal_best(swimmer, sys.argv[3])
+        history = archive.progression(swimmer, sys.argv[3])
+        print(f"{swimmer} {sys.argv[3]}: best {best['ticks'] / 1e9:.2f}" if best else "no result")
+        for started_at, ticks, _ in history:
+            print(f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(started_at))}  {ticks / 1e9:8.2f}")
+    else:
+        for event, ticks in sorted(archive.personal_bests(swimmer).items()):
+            print(f"{swimmer} {event}: {ticks / 1e9:.2f}")
+    print(f"{(time.perf_counter() - t) * 1000:.1f} ms")
@@ -0,0 +1,210 @@
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+# Append-only write-ahead log of every race event, so a crashed scoreboard
+# can rebuild its state and a disputed race can be replayed.
+#
+# File: MAGIC, then fixed 18 byte little-endian records
+#   ts      int64  TimerEngine clock (monotonic ns) when the event happened
+#   kind    uint8  START / STOP / SPLIT / LAP / RESET
+#   lane    uint8  1-based lane, 0 for race-wide events
+#   value   int64  elapsed race ns of a split/lap or at a stop, 0 otherwise
+MAGIC = b"SWJ1"
+RECORD = struct.Struct("<qBBq")
+
+START = 1
+STOP = 2
+SPLIT = 3
+LAP = 4
+RESET = 5
+NAMES = {START: "start", STOP: "stop", SPLIT: "split", LAP: "lap", RESET: "reset"}
+
+JOURNAL_PATH = "race.journal"
+FLUSH_RECORDS = 64      # flush and fsync once this many records are waiting
+FLUSH_INTERVAL = 0.2    # or after this many seconds
+
+Record = Tuple[int, int, int, int]  # ts, kind, lane, value
+
+
+class Journal:
+    def __init__(self, path: str = JOURNAL_PATH, clock=time.perf_counter_ns):
+        self.path = path
+        self.clock = clock
+        _repair(path)
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+
+        self.pending = bytearray()
+        self.lock = threading.Lock()        # guards pending, record() only ever waits for a swap
+        self.file_lock = threading.Lock()   # guards the file, held across write and fsync
+        self.wake = threading.Event()
+        self.closed = False
+        self.flushes = 0
+        threading.Thread(target=self._flusher, daemon=True).start()
+
+    def record(self, kind: int, lane: int = 0, value: int = 0, ts: Optional[int] = None):
+        with self.lock:
+            self.pending += RECORD.pack(self.clock() if ts is None else ts, kind, lane, value)
+            full = len(self.pending) >= FLUSH_RECORDS * RECORD.size
+        if full:
+            self.wake.set()
+
+    def _flusher(self):
+        while not self.closed:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write and fsync everything recorded so far, one fsync per batch."""
+        with self.file_lock:
+            with self.lock:
+                data, self.pending = self.pending, bytearray()
+            if not data or self.file.closed:
+                return
+            # The disk is only waited on here, record() can go on meanwhile
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.flushes += 1
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.flush()
+        with self.file_lock:
+            self.file.close()
+
+
+# Cut off a record that was half written when the process died
+def _repair(path: str):
+    if not os.path.exists(path):
+        return
+    size = os.path.getsize(path)
+    if size < len(MAGIC):
+        os.truncate(path, 0)
+        return
+    extra = (size - len(MAGIC)) % RECORD.size
+    if extra:
+        os.truncate(path, size - extra)
+
+
+def read(path: str = JOURNAL_PATH) -> List[Record]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data:
+        return []  # created but the process ended before anything was written
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a race journal")
+    body = memoryview(data)[len(MAGIC):]
+    body = body[:len(body) - len(body) % RECORD.size]
+    return list(RECORD.iter_unpack(body))
+
+
+# --------------------
+# Rebuilding state
+# --------------------
+def apply(timer, store, lanes: List[str], record: Record, shift: int = 0):
+    """Apply one record to a TimerEngine and LapStore, shift moves the clock timestamps."""
+    ts, kind, lane, value = record
+    if kind == SPLIT:
+        name = lanes[lane - 1]
+        store.add_lap(name, value - store.split(name), split=value)
+    elif kind == LAP:
+        name = lanes[lane - 1]
+        store.add_lap(name, value - store.total_time(name), split=value)
+    elif kind == START:
+        timer.start(at_ns=ts + shift)
+    elif kind == STOP:
+        timer.pause(at_ns=ts + shift)
+    elif kind == RESET:
+        timer.reset()
+        store.reset()
+
+
+def restore(engine, records: List[Record]) -> int:
+    """Rebuild a RaceEngine's timer and laps from a journal, returns the number of records applied."""
+    for record in records:
+        apply(engine.timer, engine.store, engine.lanes, record)
+
+    # A race that was running keeps running, unless the clock restarted with the
+    # machine and the journal timestamps are from before the reboot
+    if engine.timer.running and records and records[-1][0] > engine.timer.now_ns():
+        engine.timer.pause(at_ns=records[-1][0])
+    engine.running = engine.timer.running
+    return len(records)
+
+
+def replay_into(app, records: List[Record], speed: Optional[float] = 1.0):
+    """Re-run a journal on a live app through its Tk loop, speed None applies it all at once."""
+    if not records:
+        return
+    engine = app.engine
+    # Move the recorded clock so the replayed race happens now
+    shift = engine.timer.now_ns() - (records[0][0] if speed is not None else records[-1][0])
+
+    def step(i: int):
+        with engine.lock:
+            while True:
+                apply(engine.timer, engine.store, engine.lanes, records[i], shift)
+                i += 1
+                if i == len(records) or speed is not None and records[i][0] > records[i - 1][0]:
+                    break
+            engine.running = engine.timer.running
+        app.redraw()
+        if i < len(records):
+            delay = (records[i][0] - records[i - 1][0]) / 1e6 / speed
+            app.root.after(int(delay), step, i)
+
+    step(0)
+
+
+def replay(records: List[Record], handle, speed: Optional[float] = 1.0, sleep=time.sleep):
+    """Call handle(record) for every record, spaced like when it was recorded.
+
+    speed 2.0 replays twice as fast, None as fast as possible.
+    """
+    if not records:
+        return
+    previous = records[0][0]
+    for record in records:
+        if speed is not None and record[0] > previous:
+            sleep((record[0] - previous) / 1e9 / speed)
+        previous = max(previous, record[0])
+        handle(record)
+
+
+# python -m Storage.journal race.journal [speed|max]
+if __name__ == "__main__":
+    from Timer.timer import TimerEngine
+    from Timer.lapstore import LapStore
+
+    path = sys.argv[1] if len(sys.argv) > 1 else JOURNAL_PATH
+    speed = sys.argv[2] if len(sys.argv) > 2 else "max"
+    records = read(path)
+
+    lanes = [f"Lane {i}" for i in range(1, max([r[2] for r in records] + [1]) + 1)]
+    laps = max([sum(1 for r in records if r[1] in (SPLIT, LAP) and r[2] == i + 1) for i in range(len(lanes))] + [1])
+    timer = TimerEngine()
+    store = LapStore(lanes, laps)
+    shift = timer.now_ns() - records[0][0] if records else 0
+
+    def show(record):
+        ts, kind, lane, value = record
+        apply(timer, store, lanes, record, shift)
+        where = f" lane {lane}" if lane else ""
+        print(f"{ts / 1e9:14.3f} {NAMES.get(kind, kind)}{where} {value / 1e9:9.2f}")
+
+    t = time.perf_counter()
+    replay(records, show, None if speed == "max" else float(speed))
+    print(f"{len(records)} records in {time.perf_counter() - t:.3f}s")
+    for name in lanes:
+        best = store.best_lap(name)
+        print(f"{name}: {store.lap_count(name)} laps, total {store.total_time(name) / 1e9:.2f}, "
+              f"best {'-' if best is None else f'{best[0] / 1e9:.2f} (#{best[1]})'}")
@@ -0,0 +1,191 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+from Timer.timer import TimerEngine, NS_PER_SECOND
+from Timer.lapstore import LapStore, TICKS_PER_SECOND
+from Storage import journal
+
+# Events published to subscribers as fn(event, lane name or None)
+ARMED = "armed"     # start requested, the countdown runs until start()
+START = "start"     # race clock started or resumed
+STOP = "stop"       # race clock paused, by hand or when every lane finished
+RESET = "reset"
+LAP = "lap"         # a lane completed a lap
+FINISH = "finish"   # a lane completed its last lap
+RESTORE = "restore" # the race was rebuilt from a journal
+
+Subscriber = Callable[[str, Optional[str]], None]
+
+
+# Race state without any display: the clock, the lanes and their laps.
+# The Tk scoreboard, the Flask page and the socket handlers all drive and
+# watch the same engine, so it also runs headless in its own thread or
+# process, e.g. for benchmarks.
+# Every change takes the lock and is published to the subscribers from the
+# thread that made it, a subscriber that touches Tk must be fed from the Tk loop.
+class RaceEngine:
+    def __init__(self, lanes: List[str], max_laps: int = 8, clock=None):
+        self.lanes = list(lanes)
+        self.max_laps = max_laps
+        self.timer = TimerEngine() if clock is None else TimerEngine(clock)
+        self.store = LapStore(self.lanes, max_laps)
+
+        # Sensors and keys address lanes as '1', '2', ..
+        self.key_map: Dict[str, str] = {str(i + 1): name for i, name in enumerate(self.lanes)}
+        self.lane_no: Dict[str, int] = {name: i + 1 for i, name in enumerate(self.lanes)}
+
+        # True from arm() until stop/reset, laps are only taken meanwhile
+        self.running: bool = False
+        # Race events are written ahead to this journal when one is attached
+        self.journal: Optional[journal.Journal] = None
+
+        self.lock = threading.RLock()
+        self.subscribers: List[Subscriber] = []
+
+    # --------------------
+    # Subscribers
+    # --------------------
+    def subscribe(self, fn: Subscriber) -> Subscriber:
+        self.subscribers.append(fn)
+        return fn
+
+    def unsubscribe(self, fn: Subscriber):
+        if fn in self.subscribers:
+            self.subscribers.remove(fn)
+
+    def _publish(self, event: str, name: Optional[str] = None):
+        for fn in self.subscribers:
+            try:
+                fn(event, name)
+            except Exception as e:
+                print("Error: ", e)
+
+    def _log(self, kind: int, name: Optional[str] = None, value: int = 0, ts: Optional[int] = None):
+        if self.journal is not None:
+            self.journal.record(kind, self.lane_no[name] if name else 0, value, ts)
+
+    # --------------------
+    # Race control
+    # --------------------
+    def arm(self) -> bool:
+        """Ask for a start, the subscriber running the countdown calls start()."""
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+            self._publish(ARMED)
+            return True
+
+    def start(self, at_ns: Optional[int] = None):
+        """Start or resume the clock, at_ns is a clock value to count from instead of now."""
+        with self.lock:
+            if self.timer.running:
+                return
+            self.running = True
+            self.timer.start(at_ns)
+            self._log(journal.START, ts=self.timer.started_ns)
+            self._publish(START)
+
+    def stop(self) -> bool:
+        """Pause the race, returns False if it was not running."""
+        with self.lock:
+            if not (self.running and self.timer.running):
+                return False
+            now = self.timer.clock()
+            self.timer.pause(now)
+            self._log(journal.STOP, value=self.timer.elapsed_ns(), ts=now)
+            self.running = False
+            self._publish(STOP)
+            return True
+
+    def reset(self):
+        with self.lock:
+            self.running = False
+            self.timer.reset()
+            self.store.reset()
+            self._log(journal.RESET)
+            self._publish(RESET)
+
+    # --------------------
+    # Laps
+    # --------------------
+    def split(self, name: str) -> int:
+        """A touch timed by the host clock now, returns the lap number or 0 if ignored."""
+        with self.lock:
+            if not self.running or self.store.is_finished(name):
+                return 0
+            elapsed = self.timer.elapsed_ns()
+            n = self.store.add_lap(name, elapsed - self.store.split(name), split=elapsed)
+            self._log(journal.SPLIT, name, elapsed)
+            self._lap_done(name, n)
+            return n
+
+    def lap(self, name: str, seconds: float) -> int:
+        """A touch at elapsed race seconds measured by a sensor, returns the lap number or 0."""
+        with self.lock:
+            if not self.running or self.store.is_finished(name):
+                return 0
+            elapsed = round(float(seconds) * TICKS_PER_SECOND)
+            n = self.store.add_lap(name, elapsed - self.store.total_time(name), split=elapsed)
+            self._log(journal.LAP, name, elapsed)
+            self._lap_done(name, n)
+            return n
+
+    def _lap_done(self, name: str, n: int):
+        self._publish(LAP, name)
+        if n == self.max_laps:
+            self._publish(FINISH, name)
+            # If every swimmer has finished, stop main timer
+            if self.store.all_finished:
+                self.stop()
+
+    # Apply one sensor message, lap_time overrides the time in the message
+    def handle_message(self, msg: dict, lap_time: Optional[float] = None):
+        cmd = msg.get("command") or msg.get("message")
+        if cmd == "start":
+            self.arm()
+        elif cmd == "stop":
+            self.stop()
+        elif cmd == "reset":
+            self.reset()
+        elif cmd == "split":
+            self.split(self.key_map[msg.get("id")])
+        elif cmd == "lap":
+            self.lap(self.key_map[msg.get("id")], msg.get("lap_time") if lap_time is None else lap_time)
+
+    # --------------------
+    # Journal
+    # --------------------
+    def restore(self, records: List[journal.Record]) -> int:
+        """Rebuild the race from journal records, subscribers see one RESTORE afterwards."""
+        with self.lock:
+            n = journal.restore(self, records)
+            self._publish(RESTORE)
+            return n
+
+    # --------------------
+    # Reads
+    # --------------------
+    def snapshot(self) -> dict:
+        """Plain-data view of the race for web pages and tools."""
+        with self.lock:
+            store = self.store
+            lanes = []
+            for name in self.lanes:
+                best = store.best_lap(name)
+                lanes.append({
+                    "lane": self.lane_no[name],
+                    "name": name,
+                    "laps": [t / NS_PER_SECOND for t in store.lap_times(name)],
+                    "best": None if best is None else best[0] / NS_PER_SECOND,
+                    "best_lap": None if best is None else best[1],
+                    "total": store.total_time(name) / NS_PER_SECOND,
+                    "finished": store.is_finished(name),
+                })
+            return {
+                "running": self.running,
+                "clock_running": self.timer.running,
+                "elapsed": self.timer.elapsed(),
+                "max_laps": self.max_laps,
+                "lanes": lanes,
+            }
@@ -0,0 +1,99 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+TICKS_PER_SECOND = 1_000_000_000  # ticks are TimerEngine nanoseconds
+PREALLOC = 1024                   # laps allocated per lane up front, 8 KB, arrays double past it
+
+
+# Lap times of every lane in preallocated integer arrays, with the per-lane
+# statistics kept up to date on every lap so a touch costs the same on lap 2
+# as on lap 60 of a distance event. Any real event fits in the first PREALLOC
+# laps, a store made with a huge max_laps (benchmarks that never finish) grows
+# by doubling instead of reserving max_laps up front.
+class LapStore:
+    def __init__(self, lanes: List[str], max_laps: int):
+        self.lanes = list(lanes)
+        self.max_laps = max_laps
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.lanes)}
+        n = len(self.lanes)
+
+        # laps[i][0:count[i]] are the lap times of lane i
+        self.laps = [array("q", bytes(8 * min(max_laps, PREALLOC))) for _ in range(n)]
+        self.count = array("l", bytes(array("l").itemsize * n))
+        self.total = array("q", bytes(8 * n))
+        self.best = array("q", bytes(8 * n))
+        self.best_index = array("l", bytes(array("l").itemsize * n))  # 1-based, 0 = no laps yet
+        self.last_split = array("q", bytes(8 * n))                  # elapsed at the last touch
+        self.finished = 0
+
+    def reset(self):
+        for i in range(len(self.lanes)):
+            self.count[i] = 0
+            self.total[i] = 0
+            self.best[i] = 0
+            self.best_index[i] = 0
+            self.last_split[i] = 0
+        self.finished = 0
+
+    def add_lap(self, name: str, lap: int, split: Optional[int] = None) -> int:
+        """Store one lap, returns its 1-based number or 0 if the lane is already done.
+
+        split is the race elapsed time of the touch, used for the current lap display.
+        """
+        i = self.index[name]
+        n = self.count[i]
+        if n >= self.max_laps:
+            return 0
+        laps = self.laps[i]
+        if n == len(laps):
+            laps.frombytes(bytes(8 * min(n, self.max_laps - n)))
+        laps[n] = lap
+        n += 1
+        self.count[i] = n
+        self.total[i] += lap
+        if n == 1 or lap < self.best[i]:  # first occurrence wins on ties
+            self.best[i] = lap
+            self.best_index[i] = n
+        if split is not None:
+            self.last_split[i] = split
+        if n == self.max_laps:
+            self.finished += 1
+        return n
+
+    # --------------------
+    # Queries, all O(1) except lap_times
+    # --------------------
+    def lap_count(self, name: str) -> int:
+        return self.count[self.index[name]]
+
+    def is_finished(self, name: str) -> bool:
+        return self.count[self.index[name]] >= self.max_laps
+
+    @property
+    def all_finished(self) -> bool:
+        return self.finished == len(self.lanes)
+
+    def last_lap(self, name: str) -> Optional[int]:
+        i = self.index[name]
+        n = self.count[i]
+        return self.laps[i][n - 1] if n else None
+
+    def best_lap(self, name: str) -> Optional[Tuple[int, int]]:
+        """(lap time, 1-based lap number) of the fastest lap, None before the first lap."""
+        i = self.index[name]
+        return (self.best[i], self.best_index[i]) if self.count[i] else None
+
+    def total_time(self, name: str) -> int:
+        return self.total[self.index[name]]
+
+    def mean_lap(self, name: str) -> Optional[float]:
+        i = self.index[name]
+        return self.total[i] / self.count[i] if self.count[i] else None
+
+    def split(self, name: str) -> int:
+        return self.last_split[self.index[name]]
+
+    def lap_times(self, name: str, start: int = 0) -> array:
+        """Copy of the laps of a lane from index start on."""
+        i = self.index[name]
+        return self.laps[i][start:self.count[i]]
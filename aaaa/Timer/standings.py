@@ -0,0 +1,60 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from Timer.lapstore import LapStore
+
+Key = Tuple[int, int, int]  # (-laps completed, cumulative ns at the last touch, lane number)
+
+
+# Race positions kept sorted as touches come in.
+# A lane's key only changes when it touches the wall, so each touch removes
+# one key and inserts it again by bisection instead of sorting every lane.
+# More laps rank first, equal laps go by who got there earlier, the lane
+# number breaks exact ties so every key is unique.
+class Standings:
+    def __init__(self, lanes: List[str], max_laps: int):
+        self.lanes = list(lanes)
+        self.max_laps = max_laps
+        self.lane_no: Dict[str, int] = {name: i + 1 for i, name in enumerate(self.lanes)}
+        self.order: List[Key] = []
+        self.keys: Dict[str, Key] = {}
+        self.reset()
+
+    def reset(self):
+        self.keys = {name: (0, 0, self.lane_no[name]) for name in self.lanes}
+        self.order = sorted(self.keys.values())
+
+    def rebuild(self, store: LapStore):
+        """Rank every lane again, after a restore."""
+        self.keys = {name: (-store.lap_count(name), store.split(name), self.lane_no[name]) for name in self.lanes}
+        self.order = sorted(self.keys.values())
+
+    def update(self, name: str, laps: int, split_ns: int) -> List[str]:
+        """Move a lane after a touch, returns the lanes whose place changed."""
+        old = self.keys[name]
+        new = (-laps, split_ns, old[2])
+        i = bisect_left(self.order, old)
+        del self.order[i]
+        insort(self.order, new)
+        self.keys[name] = new
+        j = bisect_left(self.order, new)
+        # Only the lanes between the old and the new position moved
+        lo, hi = min(i, j), max(i, j)
+        return [self.lanes[key[2] - 1] for key in self.order[lo:hi + 1]]
+
+    # --------------------
+    # Reads
+    # --------------------
+    def place(self, name: str) -> int:
+        return bisect_left(self.order, self.keys[name]) + 1
+
+    def leader(self) -> str:
+        return self.lanes[self.order[0][2] - 1]
+
+    def projection(self, name: str) -> Optional[int]:
+        """Finish time in ns at the mean pace so far, None before the first lap."""
+        laps, split_ns, _ = self.keys[name]
+        laps = -laps
+        if not laps:
+            return None
+        return split_ns + (self.max_laps - laps) * split_ns // laps
@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from Timer.engine import RaceEngine
+from Timer.timer import NS_PER_SECOND
+
+COUNTDOWN = 5          # seconds from the start button to the gun
+SPIN_NS = 2_000_000    # the last 2 ms before the gun are busy-waited, sleep() overshoots by a scheduler tick
+
+
+# Fixes t=0 of a race before the countdown starts, on the race clock.
+# Everything else is placed against that one instant instead of against each
+# other: the countdown shows the time left to it, the gun thread fires the
+# sound at it, the sensors are told when it falls on their own clocks, and
+# the engine starts counting from it however late the Tk loop gets there.
+class StartScheduler:
+    def __init__(self, engine: RaceEngine):
+        self.engine = engine
+        self.clock = engine.timer.clock
+        self.deadline: Optional[int] = None
+        self.skews = deque(maxlen=50)   # (what, ns after the deadline it happened)
+        self._cancel = threading.Event()
+
+    def schedule(self, lead_s: float = COUNTDOWN, gun: Optional[Callable[[], None]] = None,
+                 gun_lead_ns: int = 0) -> int:
+        """Put t=0 lead_s from now, gun runs on its own thread gun_lead_ns before that instant.
+
+        gun_lead_ns is how long the gun takes to be heard, e.g. the audio latency.
+        """
+        self.cancel()
+        self._cancel = threading.Event()
+        self.deadline = self.clock() + int(lead_s * NS_PER_SECOND)
+        if gun is not None:
+            threading.Thread(target=self._fire, args=(self.deadline, gun_lead_ns, gun, self._cancel),
+                             daemon=True, name="start-gun").start()
+        return self.deadline
+
+    def cancel(self):
+        self._cancel.set()
+        self.deadline = None
+
+    def remaining_ns(self) -> int:
+        return 0 if self.deadline is None else self.deadline - self.clock()
+
+    def seconds_left(self) -> int:
+        """What the countdown shows, 5 4 3 2 1 and 0 at the gun."""
+        return max(0, math.ceil(self.remaining_ns() / NS_PER_SECOND))
+
+    def next_tick_ms(self) -> int:
+        """Milliseconds until the countdown display changes next."""
+        remaining = self.remaining_ns()
+        return max(1, math.ceil((remaining - (self.seconds_left() - 1) * NS_PER_SECOND) / 1e6))
+
+    # Called on the Tk loop once the countdown reached zero
+    def go(self) -> bool:
+        if self.deadline is None or not self.engine.running:
+            return False
+        self.skews.append(("clock", self.clock() - self.deadline))
+        self.engine.start(at_ns=self.deadline)
+        self.deadline = None
+        return True
+
+    def _fire(self, deadline: int, lead: int, gun: Callable[[], None], cancel: threading.Event):
+        # Sleep most of the way, then spin so the gun is not a scheduler tick late
+        at = deadline - lead
+        while True:
+            left = at - self.clock()
+            if left <= SPIN_NS:
+                break
+            if cancel.wait((left - SPIN_NS) / NS_PER_SECOND):
+                return
+        while self.clock() < at:
+            pass
+        if cancel.is_set():
+            return
+        fired = self.clock()
+        try:
+            gun()
+        except Exception as e:
+            print("Error: ", e)
+        played = self.clock()
+        self.skews.append(("gun", fired - deadline))
+        self.skews.append(("sound", played - deadline))
+        print(f"Start gun {(fired - deadline) / 1e6:+.3f} ms, sound call returned {(played - deadline) / 1e6:+.3f} ms "
+              f"after t=0")
+
+    def skew(self, what: str) -> Optional[int]:
+        for name, ns in reversed(self.skews):
+            if name == what:
+                return ns
+        return None
+
+    def report(self) -> str:
+        parts = []
+        for what, label in (("gun", "gun"), ("sound", "sound call returned"), ("clock", "display started")):
+            ns = self.skew(what)
+            if ns is not None:
+                parts.append(f"{label} {ns / 1e6:+.3f} ms")
+        return "Start skew against t=0: " + (", ".join(parts) or "no start yet")
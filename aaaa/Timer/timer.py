@@ -1,25 +1,73 @@
 import time
-from typing import Dict, List, Optional
-from Screen import app
-start_time: Optional[float] = None  # timestamp when current run started, None when stopped
-elapsed_before_start: float = 0.0   # accumulated elapsed time from previous runs
-
-# --------------------
-# Time helpers
-# --------------------
-def _current_elapsed(self) -> float:
-    """Return total elapsed seconds (including previous runs)."""
-    if self.running and start_time is not None:
-        return elapsed_before_start + (time.time() - start_time)
-    return elapsed_before_start
-
-@staticmethod
-def _format_timer_display(seconds: float) -> str:
-    mins = int(seconds // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds * 100) % 100)
-    return f"{mins:02d}:{secs:02d}.{millis:02d}"
-
-@staticmethod
-def _format_seconds(seconds: float) -> str:
-    return f"{seconds:5.2f}"
\ No newline at end of file
+from typing import Optional
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_CS = 10_000_000
+
+
+# Race clock in integer nanoseconds on a monotonic counter, so NTP adjustments
+# cannot move it and long sessions do not pick up float error.
+# Every heat gets its own instance instead of sharing module globals.
+class TimerEngine:
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        # (clock value when the current run started or None when stopped,
+        #  elapsed ns accumulated from previous runs), swapped as one tuple so
+        # the ingest thread never reads half of a start/pause
+        self._state = (None, 0)
+
+    @property
+    def running(self) -> bool:
+        return self._state[0] is not None
+
+    @property
+    def started_ns(self) -> Optional[int]:
+        return self._state[0]
+
+    def now_ns(self) -> int:
+        return self.clock()
+
+    def start(self, at_ns: Optional[int] = None):
+        """Start or resume, at_ns is a clock value to count from instead of now."""
+        started, accumulated = self._state
+        if started is None:
+            self._state = (self.clock() if at_ns is None else at_ns, accumulated)
+
+    resume = start
+
+    def pause(self, at_ns: Optional[int] = None):
+        """Stop counting, at_ns is a clock value to stop at instead of now."""
+        started, accumulated = self._state
+        if started is not None:
+            self._state = (None, accumulated + (self.clock() if at_ns is None else at_ns) - started)
+
+    def reset(self):
+        self._state = (None, 0)
+
+    # --------------------
+    # Reads, cheap enough for every frame and every sensor message
+    # --------------------
+    def elapsed_ns(self) -> int:
+        started, accumulated = self._state
+        if started is None:
+            return accumulated
+        return accumulated + self.clock() - started
+
+    def elapsed_cs(self) -> int:
+        return self.elapsed_ns() // NS_PER_CS
+
+    def elapsed(self) -> float:
+        """Return total elapsed seconds (including previous runs)."""
+        return self.elapsed_ns() / NS_PER_SECOND
+
+    def to_elapsed_ns(self, clock_ns: int) -> int:
+        """Elapsed race time at an earlier clock value of this run."""
+        started, accumulated = self._state
+        if started is None:
+            return accumulated
+        return accumulated + clock_ns - started
+
+
+def ns_to_cs(ns: int) -> int:
+    """Nanoseconds to centiseconds, rounded like the 5.2f lap format."""
+    return (ns + NS_PER_CS // 2) // NS_PER_CS
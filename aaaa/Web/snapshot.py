@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Tuple
+
+from Web.stream import EventStream
+
+LONG_POLL_MAX = 30.0  # seconds a long-poll request may wait for the next version
+
+
+# Race state serialized once per version for clients that poll.
+# The version is the EventStream's, so it moves exactly when the engine
+# publishes a change. Between changes every request gets the same bytes and
+# the same strong ETag, a client sending it back in If-None-Match gets a 304,
+# and a long-poll waits on the stream's condition for the next version.
+class SnapshotCache:
+    def __init__(self, stream: EventStream, build: Callable[[], dict]):
+        self.stream = stream
+        self.build = build
+        # Tags from an earlier run of the server must never match
+        self.boot = os.urandom(4).hex()
+        self.lock = threading.Lock()
+        self.version = -1
+        self.body = b""
+        self.etag = ""
+        self.builds = 0
+
+    def get(self) -> Tuple[int, bytes, str]:
+        """(version, json body, ETag) of the current state."""
+        version = self.stream.version
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    body = json.dumps(dict(self.build(), version=version, server_time=time.time()),
+                                      separators=(",", ":")).encode("utf-8")
+                    self.body, self.etag, self.version = body, f'"{self.boot}-{version}"', version
+                    self.builds += 1
+        return self.version, self.body, self.etag
+
+    def wait(self, etag: str, timeout: float = LONG_POLL_MAX) -> Tuple[int, bytes, str]:
+        """get() once the state no longer matches etag, or after timeout."""
+        version, body, current = self.get()
+        if current != etag:
+            return version, body, current
+        deadline = time.monotonic() + min(timeout, LONG_POLL_MAX)
+        changed = self.stream.changed
+        with changed:
+            while self.stream.version == version:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                changed.wait(left)
+        return self.get()
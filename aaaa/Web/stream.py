@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Iterator, Optional
+
+from Timer.engine import RaceEngine, LAP, RESET, RESTORE
+
+HISTORY = 256        # deltas kept so a reconnecting client can catch up from Last-Event-ID
+KEEPALIVE = 15.0     # seconds between comment lines on an idle stream
+
+
+# Pushes race changes to any number of spectators as Server-Sent Events.
+# The engine calls on_race_event once per change, the SSE text is built once
+# there and every client thread only copies the same bytes out, so the cost per
+# change does not grow with the number of phones. The running clock is not
+# streamed: every message carries the elapsed time and whether the clock runs,
+# and the page counts on its own between messages.
+class EventStream:
+    def __init__(self, engine: RaceEngine):
+        self.engine = engine
+        self.version = 0
+        self.history = deque(maxlen=HISTORY)  # (version, encoded event)
+        self.changed = threading.Condition()
+        self.clients = 0
+        engine.subscribe(self.on_race_event)
+
+    # --------------------
+    # Producing
+    # --------------------
+    def on_race_event(self, event: str, name: Optional[str]):
+        if event in (RESET, RESTORE):
+            # Everything changed, clients replace their state
+            self._push("snapshot", self.engine.snapshot())
+        elif event == LAP:
+            self._push("lap", self._lap(name))
+        else:
+            self._push("clock", self._clock(event))
+
+    def _clock(self, event: str) -> dict:
+        engine = self.engine
+        return {"event": event, "running": engine.running, "clock_running": engine.timer.running,
+                "elapsed": engine.timer.elapsed()}
+
+    def _lap(self, name: str) -> dict:
+        store = self.engine.store
+        best, best_lap = store.best_lap(name)
+        data = self._clock(LAP)
+        data.update({
+            "lane": self.engine.lane_no[name],
+            "lap": store.lap_count(name),
+            "lap_time": store.last_lap(name) / 1e9,
+            "split": store.split(name) / 1e9,
+            "best": best / 1e9,
+            "best_lap": best_lap,
+            "total": store.total_time(name) / 1e9,
+            "finished": store.is_finished(name),
+        })
+        return data
+
+    def _push(self, kind: str, data: dict):
+        with self.changed:
+            self.version += 1
+            self.history.append((self.version, encode(self.version, kind, data)))
+            self.changed.notify_all()
+
+    # --------------------
+    # Consuming
+    # --------------------
+    def events(self, last_id: Optional[str] = None) -> Iterator[bytes]:
+        """SSE body for one client: a snapshot (or missed deltas) first, then every change."""
+        with self.changed:
+            seen = self.version
+            oldest = self.history[0][0] if self.history else seen + 1
+        try:
+            resume = int(last_id) if last_id else None
+        except ValueError:
+            resume = None
+
+        if resume is not None and oldest - 1 <= resume <= seen:
+            seen = resume  # the client was here before, send only what it missed
+        else:
+            yield encode(seen, "snapshot", self.engine.snapshot())
+
+        with self.changed:
+            self.clients += 1
+        try:
+            while True:
+                with self.changed:
+                    if self.version == seen:
+                        self.changed.wait(KEEPALIVE)
+                    behind = self.history and self.history[0][0] > seen + 1
+                    pending = [data for version, data in self.history if version > seen]
+                    seen = self.version
+                if behind:
+                    # Fell further behind than the history, start over from the current state
+                    yield encode(seen, "snapshot", self.engine.snapshot())
+                elif pending:
+                    yield b"".join(pending)
+                else:
+                    yield b": keepalive\n\n"
+        finally:
+            with self.changed:
+                self.clients -= 1
+
+
+def encode(version: int, kind: str, data: dict) -> bytes:
+    body = json.dumps(dict(data, version=version, server_time=time.time()), separators=(",", ":"))
+    return f"id: {version}\nevent: {kind}\ndata: {body}\n\n".encode("utf-8")
@@ -0,0 +1,265 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "aaaa"))
+from Connection import ingest
+from Connection import MicrocontrollerConnection as mConn
+from Timer.engine import RaceEngine
+
+# End-to-end load test of the sensor ingest path.
+# N lanes x M sensors send splits from a separate process over real TCP
+# connections into start_server (asyncio) or the old receiveData threads, or as
+# datagrams into the UDP listener,
+# decoded messages go into a headless RaceEngine. Every message carries the
+# monotonic ns it was written at, latency is measured when the engine has
+# applied it, both processes read the same CLOCK_MONOTONIC.
+#
+# usage: python bench/loadgen.py [--lanes 8] [--sensors 2] [--rate 50] [--seconds 5] ...
+#        python bench/loadgen.py --compare bench/results/old.json
+HOST = "127.0.0.1"
+PORT = 5099
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DRAIN_TIMEOUT = 5.0  # seconds to wait for the server to catch up after sending stops
+
+LENGTH = struct.Struct(">I")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Sensor ingest load generator")
+    p.add_argument("--lanes", type=int, default=8)
+    p.add_argument("--sensors", type=int, default=2, help="sensor connections per lane")
+    p.add_argument("--rate", type=float, default=50.0, help="splits per second per sensor")
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--prefixed", type=float, default=0.5, help="share of length-prefixed frames, rest plain JSON")
+    p.add_argument("--fragment", type=float, default=0.2, help="share of messages written in several pieces")
+    p.add_argument("--burst-every", type=float, default=1.0,
+                   help="seconds between bursts where every sensor touches at once, 0 for none")
+    p.add_argument("--procs", type=int, default=1, help="sender processes")
+    p.add_argument("--path", choices=["asyncio", "threads", "udp"], default="asyncio")
+    p.add_argument("--duplicate", type=float, default=0.0,
+                   help="share of udp datagrams sent twice, the listener must drop the copy")
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--out", default=RESULTS_DIR, help="directory for the result json, '' to not save")
+    p.add_argument("--compare", help="earlier result json to compare against")
+    return p.parse_args(argv)
+
+
+# --------------------
+# Senders, run in child processes
+# --------------------
+def encode(msg: dict, prefixed: bool) -> bytes:
+    body = json.dumps(msg, separators=(",", ":")).encode("utf-8")
+    return LENGTH.pack(len(body)) + body if prefixed else body
+
+
+def sensor(lane: int, index: int, cfg: dict, start_at: float, counts: list):
+    rng = random.Random(lane * 1000 + index)
+    udp = cfg["path"] == "udp"
+    if udp:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect((HOST, cfg["port"]))
+    else:
+        sock = socket.create_connection((HOST, cfg["port"]))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    end = start_at + cfg["seconds"]
+    rate = cfg["rate"]
+    burst_every = cfg["burst_every"]
+    next_touch = start_at + rng.expovariate(rate) if rate > 0 else end
+    next_burst = start_at + burst_every if burst_every > 0 else end
+    seq = 0
+    sent = 0
+    with sock:
+        while True:
+            burst = next_burst <= next_touch
+            at = next_burst if burst else next_touch
+            if at >= end:
+                break
+            delay = at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            seq += 1
+            msg = {"id": str(lane), "message": "split", "seq": seq, "burst": burst,
+                   "sent_ns": time.perf_counter_ns()}
+            if udp:
+                # One sensor per device id, so (device, seq) is unique
+                msg["device"] = f"{lane}.{index}"
+            data = encode(msg, rng.random() < cfg["prefixed"])
+            if udp:
+                sock.send(data)
+                if rng.random() < cfg["duplicate"]:
+                    sock.send(data)
+            elif rng.random() < cfg["fragment"] and len(data) > 2:
+                # A few separate writes so the server sees partial frames
+                cuts = sorted(rng.sample(range(1, len(data)), min(3, len(data) - 1)))
+                for a, b in zip([0] + cuts, cuts + [len(data)]):
+                    sock.sendall(data[a:b])
+                    time.sleep(0.0001)
+            else:
+                sock.sendall(data)
+            sent += 1
+
+            if burst:
+                next_burst += burst_every
+            else:
+                next_touch += rng.expovariate(rate)
+    counts.append(sent)
+
+
+def sender_process(sensors: list, cfg: dict, start_at: float, results):
+    counts = []
+    threads = [threading.Thread(target=sensor, args=(lane, i, cfg, start_at, counts)) for lane, i in sensors]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(sum(counts))
+
+
+# --------------------
+# Receiving side: real ingest path into a headless engine
+# --------------------
+class Sink:
+    def __init__(self, lanes: int):
+        # Lanes never finish, LapStore only allocates the laps that actually arrive
+        self.engine = RaceEngine([f"Lane {i}" for i in range(1, lanes + 1)], max_laps=10 ** 7)
+        self.engine.start()
+        self.latency_ns = []
+        self.burst_ns = []
+
+    def on_message(self, msg: dict):
+        self.engine.handle_message(msg)
+        latency = time.perf_counter_ns() - msg["sent_ns"]
+        # list.append is atomic, fine from several receiveData threads
+        (self.burst_ns if msg.get("burst") else self.latency_ns).append(latency)
+
+    @property
+    def received(self) -> int:
+        return len(self.latency_ns) + len(self.burst_ns)
+
+
+def serve_threads(sink: Sink, port: int):
+    """The old blocking path: one receiveData thread per connection."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((HOST, port))
+    server.listen(1024)
+
+    def accept():
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=mConn.receiveData, args=(conn, lambda msg, app: sink.on_message(msg), None),
+                             daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))] / 1000
+
+    return {"p50_us": at(0.50), "p99_us": at(0.99), "p999_us": at(0.999), "max_us": values[-1] / 1000}
+
+
+def git_version() -> str:
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    sink = Sink(args.lanes)
+    if args.path == "asyncio":
+        server = ingest.start_server(sink.on_message, HOST, args.port)
+    elif args.path == "udp":
+        server = ingest.start_udp_server(sink.on_message, HOST, args.port)
+    else:
+        server = serve_threads(sink, args.port)
+
+    cfg = {"port": args.port, "seconds": args.seconds, "rate": args.rate, "prefixed": args.prefixed,
+           "fragment": args.fragment, "burst_every": args.burst_every, "path": args.path,
+           "duplicate": args.duplicate}
+    sensors = [(lane, i) for lane in range(1, args.lanes + 1) for i in range(args.sensors)]
+    results = multiprocessing.Queue()
+    start_at = time.monotonic() + 0.5  # time for every sensor to connect
+    procs = [multiprocessing.Process(target=sender_process, args=(sensors[p::args.procs], cfg, start_at, results))
+             for p in range(args.procs)]
+    for p in procs:
+        p.start()
+    sent = sum(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+    duration = time.monotonic() - start_at
+
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while sink.received < sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if args.path == "threads":
+        server.close()
+    else:
+        server.stop()
+
+    latency = sink.latency_ns + sink.burst_ns
+    return {
+        "version": git_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": dict(cfg, lanes=args.lanes, sensors=args.sensors, procs=args.procs),
+        "sent": sent,
+        "received": sink.received,
+        "lost": sent - sink.received,
+        "events_per_s": sink.received / duration,
+        "latency": percentiles(latency),
+        "burst_latency": percentiles(sink.burst_ns),
+        "splits_recorded": sum(sink.engine.store.lap_count(name) for name in sink.engine.lanes),
+        "duplicates_dropped": server.dedup.duplicates if args.path == "udp" else 0,
+    }
+
+
+def print_result(r: dict, old: dict = None):
+    print(f"{r['version']} {r['config']['path']}: {r['received']}/{r['sent']} events, "
+          f"{r['events_per_s']:.0f} events/s, lost {r['lost']}")
+    for key in ("latency", "burst_latency"):
+        parts = []
+        for name, value in r[key].items():
+            text = f"{name} {value:.0f}"
+            if old and old.get(key, {}).get(name):
+                text += f" ({(value / old[key][name] - 1) * 100:+.0f}%)"
+            parts.append(text)
+        print(f"  {key}: " + ", ".join(parts))
+    if old:
+        print(f"  vs {old['version']}: {(r['events_per_s'] / old['events_per_s'] - 1) * 100:+.1f}% events/s")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+
+    result = run(args)
+    print_result(result, old)
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        path = os.path.join(args.out, f"loadgen-{time.strftime('%Y%m%d-%H%M%S')}-{args.path}.json")
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print("Saved", path)
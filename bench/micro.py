@@ -0,0 +1,276 @@
+import argparse
+import contextlib
+import json
+import os
+import struct
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "aaaa"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The scoreboard runs against a stand-in Tk and no sound card
+import stubtk
+sys.modules["tkinter"] = stubtk
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.chdir(ROOT)  # music/ and the journal are relative to the repo
+
+import swimtimer
+from Connection import binary_event
+from Connection import MicrocontrollerConnection as mConn
+from Connection.framing import FrameDecoder
+from Screen.render import format_clock
+from Timer.engine import RaceEngine
+
+# Microbenchmarks of the code that runs on every message and every frame.
+#
+# usage: python bench/micro.py                  run and compare with bench/baseline.json
+#        python bench/micro.py --save-baseline  store this run as the new baseline
+#        python bench/micro.py -k update_timer --json out.json
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+THRESHOLD = 0.10     # slower than the baseline by more than this is a regression
+MIN_TIME = 0.05      # seconds per timed run, the op count is scaled up to reach it
+REPEAT = 5
+
+BENCHES = {}
+
+
+def bench(name):
+    """Register setup(), which returns (fn, ops done by one fn() call)."""
+    def register(setup):
+        BENCHES[name] = setup
+        return setup
+    return register
+
+
+# --------------------
+# Fixtures
+# --------------------
+def sensor_stream(messages: int = 1000) -> bytes:
+    """Plain JSON, length-prefixed and binary frames mixed like a real deck."""
+    out = bytearray()
+    for k in range(messages):
+        lane = k % 8 + 1
+        if k % 3 == 0:
+            out += json.dumps({"id": str(lane), "message": "split"}).encode("utf-8")
+        elif k % 3 == 1:
+            body = json.dumps({"id": str(lane), "message": "lap", "lap_time": f"{k * 0.37:.2f}"}).encode("utf-8")
+            out += struct.pack(">I", len(body)) + body
+        else:
+            out += binary_event.encode(lane, binary_event.LAP, k, k * 370_000)
+    return bytes(out)
+
+
+# Hands out a byte stream at most chunk bytes per recv_into, like a slow sensor link
+class FakeConn:
+    def __init__(self, data: bytes, chunk: int):
+        self.data = memoryview(data)
+        self.chunk = chunk
+        self.pos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def recv_into(self, buffer) -> int:
+        n = min(self.chunk, len(buffer), len(self.data) - self.pos)
+        buffer[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+# max_laps only keeps the lanes from finishing, LapStore allocates as the laps come
+def make_app(lanes: int, laps: int = 0) -> swimtimer.SwimTimerApp:
+    engine = RaceEngine([f"Lane {i}" for i in range(1, lanes + 1)], max_laps=10 ** 7)
+    app = swimtimer.SwimTimerApp(stubtk.Tk(), engine)
+    engine.start()
+    for k in range(laps):
+        engine.lap(engine.lanes[k % lanes], (k + 1) * 30.0)
+    return app
+
+
+# --------------------
+# Benchmarks
+# --------------------
+STREAM = sensor_stream()
+MESSAGES = len(FrameDecoder().feed(STREAM))
+
+for chunk in (1, 16, 64, 1024):
+    @bench(f"handle_client/chunk={chunk}")
+    def _(chunk=chunk):
+        received = []
+        return (lambda: swimtimer.handle_client(FakeConn(STREAM, chunk), received.append)), MESSAGES
+
+
+@bench("decoder/one_feed")
+def _():
+    return (lambda: FrameDecoder().feed(STREAM)), MESSAGES
+
+
+@bench("format/_format_timer_display")
+def _():
+    fmt = swimtimer.SwimTimerApp._format_timer_display
+    values = [k * 0.05 for k in range(1000)]
+    return (lambda: [fmt(v) for v in values]), len(values)
+
+
+@bench("format/_format_seconds")
+def _():
+    fmt = swimtimer.SwimTimerApp._format_seconds
+    values = [k * 0.37 for k in range(1000)]
+    return (lambda: [fmt(v) for v in values]), len(values)
+
+
+@bench("format/format_clock_uncached")
+def _():
+    fmt = format_clock.__wrapped__
+    values = list(range(0, 100_000, 100))
+    return (lambda: [fmt(v) for v in values]), len(values)
+
+
+for laps in (10, 10_000):
+    @bench(f"record_lap/laps={laps}")
+    def _(laps=laps):
+        app = make_app(8, laps)
+        lanes = app.swimmers
+        return (lambda: [app.record_lap(name) for name in lanes]), len(lanes)
+
+    @bench(f"set_lap/laps={laps}")
+    def _(laps=laps):
+        app = make_app(8, laps)
+        lanes = app.swimmers
+        t = [laps * 30.0]
+
+        def run():
+            for name in lanes:
+                t[0] += 0.5
+                app.set_lap(t[0], name)
+        return run, len(lanes)
+
+for lanes in (4, 8, 10):
+    @bench(f"update_timer/lanes={lanes}")
+    def _(lanes=lanes):
+        app = make_app(lanes)
+        return app.update_timer, 1
+
+
+@bench("handle_message/swimtimer")
+def _():
+    app = make_app(8)
+    swimtimer.app, swimtimer.engine = app, app.engine
+    msgs = [{"id": str(lane), "message": "split"} for lane in range(1, 9)]
+    return (lambda: [swimtimer.handle_message(m) for m in msgs]), len(msgs)
+
+
+@bench("handle_message/connection")
+def _():
+    engine = make_app(8).engine
+    msgs = [{"id": str(lane), "command": "lap", "lap_time": "0"} for lane in range(1, 9)]
+
+    def run():
+        for m in msgs:
+            m["lap_time"] = engine.timer.elapsed()
+            mConn.handle_message(m, engine)
+    return run, len(msgs)
+
+
+@bench("handle_message/engine")
+def _():
+    engine = make_app(8).engine
+    msgs = [{"id": str(lane), "message": "split"} for lane in range(1, 9)]
+    return (lambda: [engine.handle_message(m) for m in msgs]), len(msgs)
+
+
+# --------------------
+# Runner
+# --------------------
+def measure(setup) -> dict:
+    fn, ops = setup()
+    number = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t
+        if elapsed >= MIN_TIME:
+            break
+        number *= 2 if elapsed * 10 > MIN_TIME else 10
+
+    runs = [elapsed]
+    for _ in range(REPEAT - 1):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append(time.perf_counter() - t)
+    runs.sort()
+    per_op = 1e9 / (number * ops)
+    return {"ns_per_op": runs[0] * per_op, "median_ns_per_op": runs[len(runs) // 2] * per_op,
+            "ops": number * ops}
+
+
+def run(pattern: str = "") -> dict:
+    results = {}
+    # The handlers print every message, that goes nowhere while timing
+    with open(os.devnull, "w") as null:
+        for name, setup in BENCHES.items():
+            if pattern in name:
+                with contextlib.redirect_stdout(null):
+                    results[name] = measure(setup)
+                print(f"{name:34s} {results[name]['ns_per_op']:12.1f} ns/op", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD) -> list:
+    """Names of benchmarks slower than the baseline by more than threshold."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        change = r["ns_per_op"] / base["ns_per_op"] - 1
+        r["baseline_ns_per_op"] = base["ns_per_op"]
+        r["change"] = change
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Timing hot path microbenchmarks")
+    p.add_argument("-k", default="", help="only run benchmarks whose name contains this")
+    p.add_argument("--baseline", default=BASELINE)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--threshold", type=float, default=THRESHOLD)
+    p.add_argument("--json", help="write the results here, - for stdout")
+    args = p.parse_args()
+
+    results = run(args.k)
+    report = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0], "results": results}
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Saved baseline", args.baseline, file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, r in results.items():
+            if "change" in r:
+                flag = "  REGRESSION" if name in regressions else ""
+                print(f"{name:34s} {r['change'] * 100:+7.1f}% vs baseline{flag}", file=sys.stderr)
+    else:
+        print("No baseline yet, run with --save-baseline", file=sys.stderr)
+    report["regressions"] = regressions
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,69 @@
+# Just enough of tkinter for SwimTimerApp to run headless in benchmarks.
+# Widgets only remember their options, after() callbacks are kept but never run,
+# so what gets measured is the scoreboard code and not Tk drawing.
+class Widget:
+    def __init__(self, master=None, **kw):
+        self.options = kw
+
+    def config(self, **kw):
+        self.options.update(kw)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key)
+
+    def grid(self, **kw):
+        pass
+
+    def pack(self, **kw):
+        pass
+
+    def bind(self, *args):
+        pass
+
+
+class Tk(Widget):
+    def __init__(self):
+        super().__init__()
+        self.jobs = 0
+
+    def title(self, *args):
+        pass
+
+    def geometry(self, *args):
+        pass
+
+    def after(self, ms, fn, *args):
+        self.jobs += 1
+        return f"after#{self.jobs}"
+
+    def after_cancel(self, job):
+        pass
+
+    def mainloop(self):
+        pass
+
+
+class Label(Widget):
+    pass
+
+
+class Frame(Widget):
+    pass
+
+
+class Canvas(Widget):
+    def __init__(self, master=None, **kw):
+        super().__init__(master, **kw)
+        self.items = {}
+
+    def create_text(self, x, y, **kw):
+        self.items[len(self.items) + 1] = kw
+        return len(self.items)
+
+    def itemconfigure(self, item, **kw):
+        self.items[item].update(kw)
+
+    def itemcget(self, item, key):
+        return self.items[item].get(key)
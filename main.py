@@ -1,5 +1,5 @@
 import test
 import var
 
-test.app.run()
+test.main()
 
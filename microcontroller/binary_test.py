@@ -0,0 +1,21 @@
+import socket
+import struct
+import time
+
+HOST = '127.0.0.1'  # Replace with IP of computer running the Tkinter app
+PORT = 5000
+
+# Same layout as aaaa/Connection/binary_event.py: magic, version, lane, event, seq, timestamp_us
+FRAME = struct.Struct(">BBBBIQ")
+MAGIC = 0xB5
+VERSION = 1
+LAP = 4
+
+lane = 2
+seq = 1
+lap_time_us = 59_200_000
+
+with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    s.connect((HOST, PORT))
+    s.sendall(FRAME.pack(MAGIC, VERSION, lane, LAP, seq, lap_time_us))
+    time.sleep(0.1)
@@ -0,0 +1,84 @@
+import json
+import socket
+import sys
+import threading
+import time
+
+# Stand-in for a lane Pico, for testing clock sync and command acks without hardware.
+# usage: python fake_pico.py [port] [lane] [offset_ms] [drift_ppm]
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+LANE = sys.argv[2] if len(sys.argv) > 2 else "1"
+OFFSET_MS = float(sys.argv[3]) if len(sys.argv) > 3 else 1234.5
+DRIFT_PPM = float(sys.argv[4]) if len(sys.argv) > 4 else 40.0
+
+HOST = '127.0.0.1'  # Replace with IP of computer running the Tkinter app
+APP_PORT = 5000
+
+
+# The Pico's own microsecond clock, off by OFFSET_MS and running DRIFT_PPM fast
+def ticks_us() -> int:
+    return int(time.perf_counter_ns() * (1 + DRIFT_PPM * 1e-6) / 1000 + OFFSET_MS * 1000)
+
+
+def handle(conn):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    with conn:
+        while True:
+            chunk = conn.recv(1024)
+            if not chunk:
+                break
+            buffer += chunk.decode("utf-8")
+            while buffer.strip():
+                try:
+                    msg, end = decoder.raw_decode(buffer.lstrip())
+                except json.JSONDecodeError:
+                    break
+                buffer = buffer.lstrip()[end:]
+
+                # Every message is acked with its seq, sync replies add the clock readings
+                t1 = ticks_us()
+                reply = {"ack": msg.get("seq"), "id": LANE}
+                if msg.get("command") == "sync":
+                    reply["t1"] = t1
+                    reply["t2"] = ticks_us()
+                else:
+                    print("Command:", msg)
+                    if "start_us" in msg:
+                        print(f"Start in {(int(msg['start_us']) - t1) / 1000:.1f} ms on this clock")
+                conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+# Send a lap touch to the app stamped with this Pico's clock
+def send_lap(lap_time: float):
+    data = {"id": LANE, "message": "lap", "lap_time": str(lap_time), "device_us": ticks_us()}
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect((HOST, APP_PORT))
+        s.sendall(json.dumps(data).encode("utf-8"))
+
+
+# Same touch as one datagram to an app started with --udp, sent again until its seq is acked
+def send_lap_udp(lap_time: float, seq: int, tries: int = 5, timeout: float = 0.02) -> bool:
+    data = {"id": LANE, "message": "lap", "lap_time": str(lap_time), "device_us": ticks_us(), "seq": seq}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.settimeout(timeout)
+        s.connect((HOST, APP_PORT))
+        for _ in range(tries):
+            s.send(json.dumps(data).encode("utf-8"))
+            try:
+                if json.loads(s.recv(256)).get("ack") == seq:
+                    return True
+            except (socket.timeout, ValueError):
+                pass
+    return False
+
+
+if __name__ == "__main__":
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(("0.0.0.0", PORT))
+        s.listen()
+        print(f"Fake Pico lane {LANE} on port {PORT}, offset {OFFSET_MS} ms, drift {DRIFT_PPM} ppm")
+        while True:
+            conn, addr = s.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
@@ -1,76 +1,161 @@
-from flask import Flask, url_for, render_template, jsonify, request
-import webbrowser
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "aaaa"))
+from Monitor.startup import startup  # first, so the startup report covers Flask's import
+
+from flask import Flask, url_for, render_template, jsonify, request, Response, stream_with_context
 #import pymongo
 import csv
 import json
+import threading
 import var
-import importlib
 import hm
 
-# Creates Flask application named "app" and pass it the __name__,  which holds the name
-# of the current python module, flask needs it for some work behind the scenes
-app = Flask(__name__) 
-
-# var.a = 0
-# b = var.b
-# y = var.y
-
-####
-
-@app.route('/') # Tells python it will work with a web browser (HTTP client)
-def index():
-    return render_template("index.html", newA = var.a, newB = var.b, newY = var.y )
-
-@app.route('/data')
-def data():
-    hm.run_task()
-    # Always return the *current* values from var.py
-    importlib.reload(hm)
-    return jsonify({
-        "a": var.a,
-        "b": var.b,
-        "y": var.y,
-        "t1": var.t1,
-        "t2": var.t2
-    })
-
-@app.route('/r')
-def r():
-    hm.reset_task()
-    return jsonify({
-        "a": var.a,
-        "b": var.b,
-        "y": var.y,
-        "t1": var.t1,
-        "t2": var.t2
-    })
-
-@app.route('/stop')
-def stop(id):
-    hm.stop_task()
-    return jsonify({
-        "a": var.a,
-        "b": var.b,
-        "y": var.y,
-        "t1": var.t1,
-        "t2": var.t2
-    })
-
-@app.route('/signal_stop', methods=['POST'])
-def signal_stop():
-    data = request.get_json()
-    id = data.get("id")
-    #print(id)
-    hm.stop_task(int(id))
-    return jsonify({
-        "a": var.a,
-        "b": var.b,
-        "y": var.y,
-        "t1": var.t1,
-        "t2": var.t2
-    })
+from Timer.engine import RaceEngine, ARMED, LAP, STOP, RESET
+from Monitor.metrics import metrics, CONTENT_TYPE
+from Web.stream import EventStream
+from Web.snapshot import SnapshotCache
+
+WEB_HOST = '0.0.0.0'
+WEB_PORT = 8000   # when the scoreboard serves the page, its sensor server has 5000
+
+# The spectator site for one race engine. submit(msg) takes the page's controls
+# in the sensor message format, so the scoreboard passes its EventQueue.put and
+# they reach the engine on the Tk loop like any touch, and /metrics shows the
+# scoreboard's own registry. Standalone they are applied at once on the request thread.
+def create_app(engine, submit=None):
+    # Creates Flask application named "app" and pass it the __name__,  which holds the name
+    # of the current python module, flask needs it for some work behind the scenes
+    app = Flask(__name__)
+    if submit is None:
+        # Counted like the scoreboard's EventQueue does, so /metrics has this process's messages
+        def submit(msg):
+            metrics.dispatched(msg)
+            engine.handle_message(msg)
+            metrics.updated([msg])
+
+    # The page shows the same race state the scoreboard uses, var mirrors it
+    def on_race_event(event, name):
+        if event == LAP:
+            setattr(var, f"t{engine.lane_no[name]}", engine.store.split(name) / 1e9)
+        elif event == STOP:
+            var.timer1 = False
+        elif event == RESET:
+            var.t1 = var.t2 = 0
+
+    engine.subscribe(on_race_event)
+    # Live push to the spectator pages
+    stream = EventStream(engine)
+
+    def values():
+        return {"a": engine.timer.elapsed(), "running": engine.timer.running,
+                "b": var.b, "y": var.y, "t1": var.t1, "t2": var.t2}
+
+    # Bodies are serialized once per race change, not once per request
+    values_cache = SnapshotCache(stream, values)
+    race_cache = SnapshotCache(stream, engine.snapshot)
+
+    # Cached body with its ETag, 304 when the client has it already,
+    # ?wait=seconds with If-None-Match holds the request until the next change
+    def cached(cache):
+        etag = request.headers.get("If-None-Match")
+        wait = request.args.get("wait", type=float)
+        if wait and etag:
+            version, body, current = cache.wait(etag, wait)
+        else:
+            version, body, current = cache.get()
+        headers = {"ETag": current, "Cache-Control": "no-cache"}
+        if etag == current:
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype="application/json", headers=headers)
+
+    # var.a = 0
+    # b = var.b
+    # y = var.y
+
+    ####
+
+    @app.route('/') # Tells python it will work with a web browser (HTTP client)
+    def index():
+        return render_template("index.html", newA = round(engine.timer.elapsed(), 3), newB = var.t1, newY = var.t2 )
+
+    # Read-only, the race clock is the engine's and polling no longer moves it.
+    # "a" is the elapsed time when the race last changed, count on from it while "running"
+    @app.route('/data')
+    def data():
+        return cached(values_cache)
+
+    @app.route('/r')
+    def r():
+        hm.reset_task()
+        submit({"command": "reset"})
+        submit({"command": "start"})
+        return cached(values_cache)
+
+    @app.route('/stop')
+    def stop():
+        submit({"command": "stop"})
+        return cached(values_cache)
+
+    @app.route('/signal_stop', methods=['POST'])
+    def signal_stop():
+        data = request.get_json()
+        id = data.get("id")
+        #print(id)
+        if str(id) == "0":
+            submit({"command": "stop"})
+        elif str(id) in engine.key_map:
+            submit({"id": str(id), "message": "split"})
+        else:
+            return Response(f"Unknown lane {id}", status=400)
+        return cached(values_cache)
+
+    @app.route('/race')
+    def race():
+        return cached(race_cache)
+
+    # Server-Sent Events: a snapshot on connect, then every lap and clock change as it happens
+    @app.route('/stream')
+    def live():
+        events = stream.events(request.headers.get("Last-Event-ID"))
+        return Response(stream_with_context(events), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    # Prometheus scrape target, same format as the scoreboard's own endpoint
+    @app.route('/metrics')
+    def metrics_page():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+
+def serve(engine, submit, host: str = WEB_HOST, port: int = WEB_PORT):
+    """Serve the site for a scoreboard's engine from a daemon thread of its process."""
+    site = create_app(engine, submit)
+    threading.Thread(target=site.run, kwargs={"host": host, "port": port, "threaded": True},
+                     daemon=True, name="web").start()
+    print(f"Web page on http://127.0.0.1:{port}")
+    return site
+
+
+# Standalone: a two lane race of its own, there is no countdown so a start runs the clock at once
+engine = RaceEngine(["Lane 1", "Lane 2"])
+engine.subscribe(lambda event, name: engine.start() if event == ARMED else None)
+app = create_app(engine)
 
 htmlLocation = 'http://127.0.0.1:5000'
-webbrowser.open_new_tab(htmlLocation)
+startup.mark("imports and routes")
+
+# Importing this module only builds the app, the race clock, the browser and the server start here
+def main():
+    import webbrowser
+    engine.start()
+    with startup.phase("browser"):
+        webbrowser.open_new_tab(htmlLocation)
+    if "--startup-report" in sys.argv:
+        print(startup.report())
+    app.run()
 
-app.run()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file